@@ -0,0 +1,18 @@
+import os
+
+from dotenv import dotenv_values
+
+# Polars reads its out-of-core settings once, when it is imported: they must
+# be in the environment before any module of the app imports polars.
+# The streaming engine spills group-by / sort state past this budget.
+# Same sources and precedence as app.config.Settings: process env, then .env
+_dotenv = dotenv_values(".env")
+
+
+def _query_setting(name: str, default: str) -> str:
+    return os.environ.get(name) or _dotenv.get(name) or default
+
+
+os.environ.setdefault("POLARS_OOC_MEMORY_BUDGET_MB", _query_setting("QUERY_MEMORY_BUDGET_MB", "1024"))
+os.environ.setdefault("POLARS_OOC_SPILL_DIR", _query_setting("QUERY_SPILL_DIR", "/tmp/trinity-query-spill"))
+os.makedirs(os.environ["POLARS_OOC_SPILL_DIR"], exist_ok=True)
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 # Import your services
 # 🟢 UPDATED: Added imports for analysis functions
@@ -12,6 +12,9 @@ from app.services.analysis_service import (
     get_unique_values  # 👈 Added this missing import
 )
 from app.services.aggregation_service import perform_aggregation
+from app.services.value_index_service import search_values
+from app.services.coalescing_service import coalesce, normalize_filters, normalize_equals
+from shared.celery_app import celery_app
 
 router = APIRouter()
 
@@ -83,13 +86,23 @@ def scan_file(object_key: str):
 class ConvertRequest(BaseModel):
     object_key: str
     sheet_name: str
+    distributed: bool = False  # Fan-out across Celery workers (for huge files)
 
 @router.post("/datasets/convert")
 def convert_dataset(req: ConvertRequest):
     """
     Trigger the heavy conversion job:
     Excel/CSV -> Parquet File (Saved in 'processed-datasets' bucket)
+    With distributed=True the file is split into chunks converted in parallel
+    by the workers; poll /datasets/convert/status with the returned task_id.
     """
+    if req.distributed:
+        task = celery_app.send_task(
+            "worker.plan_chunked_conversion",
+            args=[req.object_key, req.sheet_name],
+        )
+        return {"status": "queued", "task_id": task.id}
+
     result = convert_sheet_to_parquet(req.object_key, req.sheet_name)
     
     if result["status"] == "error":
@@ -98,52 +111,118 @@ def convert_dataset(req: ConvertRequest):
     return result
 
 
+# C. STATUS: "Is my distributed conversion finished?"
+@router.get("/datasets/convert/status")
+def convert_status(task_id: str):
+    """
+    Follows plan task -> chord callback. Returns the final conversion result
+    (same shape as /datasets/convert) once all chunks are merged.
+    """
+    task = celery_app.AsyncResult(task_id)
+    if task.failed():
+        raise HTTPException(status_code=500, detail=str(task.result))
+    if not task.ready():
+        return {"status": "processing", "task_id": task_id}
+
+    result = task.result
+    if isinstance(result, dict) and result.get("finalize_task_id"):
+        return convert_status(result["finalize_task_id"])
+    # Single-process fallback (e.g. CSV with multi-line quoted fields)
+    if isinstance(result, dict) and result.get("status") == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+
+# D. RE-LAYOUT: "Cluster this dataset for faster dashboard queries"
+class RelayoutRequest(BaseModel):
+    filename: str
+    sort_columns: Optional[List[str]] = None  # Default: most filtered / grouped columns
+
+@router.post("/datasets/relayout")
+def relayout_dataset(req: RelayoutRequest):
+    """
+    Queues a background job that rewrites the processed Parquet sorted by the
+    hot columns, so row-group min/max statistics can skip most of the file.
+    Poll /datasets/convert/status with the returned task_id.
+    """
+    task = celery_app.send_task(
+        "worker.relayout_dataset",
+        args=[req.filename, req.sort_columns],
+    )
+    return {"status": "queued", "task_id": task.id}
+
+
 # ---------------------------------------------------------
 # 4. ANALYSIS & AGGREGATION
 # ---------------------------------------------------------
 
-# C. VIEW: Get Data for Table (with Paging & Sorting)
+# E. VIEW: Get Data for Table (with Paging & Sorting)
 class ViewRequest(BaseModel):
     filename: str
     page: int = 1
     page_size: int = 10
     sort_by: Optional[str] = None
     sort_desc: bool = False
-    filters: Optional[dict] = None
+    filters: Optional[dict] = None  # Substring search per column
+    equals: Optional[Dict[str, List[str]]] = None  # Exact values per column (dropdown picks)
 
 @router.post("/analysis/view")
 def view_data(req: ViewRequest):
-    return analyze_dataset(
+    # Identical concurrent views (dashboard bursts) share one computation
+    filters = normalize_filters(req.filters)
+    equals = normalize_equals(req.equals)
+    params = req.model_dump()
+    params.update({"page": max(req.page, 1), "filters": filters, "equals": equals})
+    return coalesce("view", params, lambda: analyze_dataset(
         req.filename, 
         req.page, 
         req.page_size, 
         req.sort_by, 
         req.sort_desc,
-        req.filters
-    )
+        filters,
+        equals
+    ))
 
-# D. STATS: Get Filter Options for a Column
+# F. STATS: Get Filter Options for a Column
 @router.get("/analysis/stats")
 def column_stats(filename: str, column: str):
     return get_column_stats(filename, column)
 
-# E. AGGREGATE: Group By calculations
+# G. AGGREGATE: Group By calculations
 class AggregateRequest(BaseModel):
     filename: str
     group_by_col: str
     operation: str  # "sum", "avg", "count", etc.
     target_col: str
+    equals: Optional[Dict[str, List[str]]] = None  # Exact values per column
 
 @router.post("/analysis/aggregate")
 def aggregate_data(req: AggregateRequest):
-    return perform_aggregation(
+    equals = normalize_equals(req.equals)
+    params = req.model_dump()
+    params["equals"] = equals
+    return coalesce("aggregate", params, lambda: perform_aggregation(
         req.filename,
         req.group_by_col,
         req.operation,
-        req.target_col
-    )
+        req.target_col,
+        equals
+    ))
 
-# F. UNIQUE VALUES: For Dropdown Filters
+# H. UNIQUE VALUES: For Dropdown Filters
 @router.get("/analysis/unique-values")
 def get_column_values(filename: str, column: str):
-    return get_unique_values(filename, column)
\ No newline at end of file
+    params = {"filename": filename, "column": column}
+    return coalesce("unique-values", params, lambda: get_unique_values(filename, column))
+
+# I. VALUE SEARCH: Typeahead for Dropdown Filters (prefix / substring, with counts)
+@router.get("/analysis/values/search")
+def search_column_values(
+    filename: str,
+    column: str,
+    q: str = "",
+    mode: str = "prefix",
+    offset: int = 0,
+    limit: int = Query(50, ge=1, le=1000),
+):
+    return search_values(filename, column, q, mode, offset, limit)
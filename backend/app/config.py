@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -13,6 +14,44 @@ class Settings(BaseSettings):
     MINIO_BUCKET_PARQUET: str = "parquet-datasets"
     MINIO_BUCKET_SUMMARY: str = "dataset-summaries"
 
+    # Shared Redis (lock store for request coalescing across uvicorn workers)
+    REDIS_URL: str = "redis://redis:6379/0"
+
+    # Request coalescing (single-flight for identical analysis queries)
+    COALESCE_ENABLED: bool = True
+    # The leader re-arms its lock every TTL/3 while computing, so the TTL only
+    # bounds how long a crashed leader blocks others
+    COALESCE_LOCK_TTL_SECONDS: float = 30
+    # Hard cap on a follower's wait (slow out-of-core queries included)
+    COALESCE_WAIT_TIMEOUT_SECONDS: float = 900.0
+    COALESCE_POLL_INTERVAL_SECONDS: float = 0.05
+    COALESCE_RESULT_TTL_SECONDS: int = 30
+
+    # Fan-out conversion (large files split across Celery workers)
+    CONVERT_FANOUT_CHUNK_MB: int = 64
+    CONVERT_FANOUT_CHUNK_ROWS: int = 250_000
+
+    # Excel reader: "auto" (fastexcel -> xlsx2csv -> openpyxl), or force one engine
+    CONVERT_EXCEL_ENGINE: str = "auto"
+
+    # Per-query memory budget: bigger working sets run on Polars' streaming
+    # engine and spill group-by / sort state to QUERY_SPILL_DIR.
+    # Read from the process environment in app/__init__.py (before polars loads)
+    QUERY_MEMORY_BUDGET_MB: int = 1024
+    QUERY_SPILL_DIR: str = "/tmp/trinity-query-spill"
+
+    # Parquet layout: named write profile ("fast", "balanced", "compact")
+    # plus optional per-setting overrides
+    PARQUET_WRITE_PROFILE: str = "balanced"
+    PARQUET_RELAYOUT_PROFILE: str = "compact"
+    PARQUET_COMPRESSION: Optional[str] = None
+    PARQUET_COMPRESSION_LEVEL: Optional[int] = None
+    PARQUET_ROW_GROUP_SIZE: Optional[int] = None
+    RELAYOUT_MAX_SORT_COLUMNS: int = 2
+
+    # Typeahead: memory for cached column dictionaries (per process)
+    VALUE_INDEX_CACHE_MB: int = 256
+
     class Config:
         env_file = ".env"
 
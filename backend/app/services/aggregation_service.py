@@ -1,38 +1,31 @@
 import polars as pl
-from app.services.storage_service import minio_client, PROCESSED_BUCKET
-import io
+from app.services.dataset_service import scan_dataset, collect_within_budget, filter_equals
+from app.services.layout_service import record_column_usage
 
-def get_parquet_stream(filename):
-    try:
-        # Check if file exists
-        minio_client.stat_object(PROCESSED_BUCKET, filename)
-        # Download
-        response = minio_client.get_object(PROCESSED_BUCKET, filename)
-        data = response.read()
-        response.close()
-        response.release_conn()
-        return io.BytesIO(data)
-    except Exception as e:
-        print(f"❌ MinIO Download Error: {e}")
-        raise e
-
-def perform_aggregation(filename: str, group_by_col: str, operation: str, target_col: str):
+def perform_aggregation(filename: str, group_by_col: str, operation: str, target_col: str, equals: dict = None):
     print(f"🔢 Aggregating {filename}: GroupBy '{group_by_col}', {operation} on '{target_col}'")
     try:
-        stream = get_parquet_stream(filename)
-        df = pl.read_parquet(stream)
+        # Only the two columns involved are read; the group-by runs out-of-core
+        # when their working set is bigger than the memory budget
+        filter_cols = [col for col, values in (equals or {}).items() if values]
+        lf, estimated_bytes = scan_dataset(filename, columns=[group_by_col, target_col] + filter_cols)
 
         # 1. Validation
-        if group_by_col not in df.columns:
+        columns = lf.collect_schema().names()
+        if group_by_col not in columns:
             return {"status": "error", "message": f"Column '{group_by_col}' not found"}
+
+        # Optional exact-value filters (dashboard slicers), pruned by row-group stats
+        lf = filter_equals(lf, equals, columns)
+        record_column_usage(filename, [col for col in filter_cols if col in columns])
         
         # 2. Prepare Data for Math
         # If operation is SUM or AVG, target must be numeric.
         if operation in ["sum", "avg"]:
             try:
                 # Force clean numeric conversion
-                df = df.with_columns(pl.col(target_col).cast(pl.Float64, strict=False))
-                df = df.drop_nulls(subset=[target_col])
+                lf = lf.with_columns(pl.col(target_col).cast(pl.Float64, strict=False))
+                lf = lf.drop_nulls(subset=[target_col])
             except:
                 return {"status": "error", "message": f"Column '{target_col}' contains non-numbers."}
 
@@ -55,15 +48,15 @@ def perform_aggregation(filename: str, group_by_col: str, operation: str, target
             return {"status": "error", "message": "Invalid operation"}
 
         # 4. EXECUTE GROUP BY (The Heavy Lifting)
-        result_df = df.group_by(group_by_col).agg(agg_expr.alias(result_col))
+        result_lf = lf.group_by(group_by_col).agg(agg_expr.alias(result_col))
 
         # 5. Optimization for Charts
         # Sort descending so the biggest bars are first
-        result_df = result_df.sort(result_col, descending=True)
+        result_lf = result_lf.sort(result_col, descending=True)
         
         # LIMIT to Top 200 groups. 
         # (This prevents plotting 50,000 distinct bars if user groups by 'ID')
-        result_df = result_df.head(200)
+        result_df = collect_within_budget(result_lf.head(200), estimated_bytes)
 
         # 6. Safety: Convert all to String/Float for JSON
         # Round floats to 2 decimal places for cleaner charts
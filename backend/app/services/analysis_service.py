@@ -1,63 +1,63 @@
 import polars as pl
-from app.services.storage_service import minio_client, PROCESSED_BUCKET
-import io
+from app.services.dataset_service import scan_dataset, collect_within_budget, filter_equals
+from app.services.value_index_service import load_value_index
+from app.services.layout_service import record_column_usage
 
-def get_parquet_path(filename):
-    """Helper to download parquet file to memory buffer."""
+def analyze_dataset(filename: str, page: int = 1, page_size: int = 10, sort_by: str = None, sort_desc: bool = False, filters: dict = None, equals: dict = None):
+    print(f"📊 Analyzing: {filename} | Filters: {filters} | Equals: {equals}")
     try:
-        minio_client.stat_object(PROCESSED_BUCKET, filename)
-        response = minio_client.get_object(PROCESSED_BUCKET, filename)
-        data = response.read()
-        response.close()
-        response.release_conn()
-        return io.BytesIO(data)
-    except Exception as e:
-        print(f"❌ MinIO Download Error: {e}")
-        raise e
-
-def analyze_dataset(filename: str, page: int = 1, page_size: int = 10, sort_by: str = None, sort_desc: bool = False, filters: dict = None):
-    print(f"📊 Analyzing: {filename} | Filters: {filters}")
-    try:
-        file_buffer = get_parquet_path(filename)
-        df = pl.read_parquet(file_buffer)
+        # Lazy scan: the query only materializes the requested page, and runs
+        # out-of-core when the dataset is bigger than the memory budget
+        lf, estimated_bytes = scan_dataset(filename)
+        columns = lf.collect_schema().names()
 
         # 1. APPLY FILTERS
         if filters:
             for col, val in filters.items():
-                if val and col in df.columns:
+                if val and col in columns:
                     # Case-insensitive substring search
-                    df = df.filter(pl.col(col).cast(pl.Utf8).str.to_lowercase().str.contains(val.lower()))
+                    lf = lf.filter(pl.col(col).cast(pl.Utf8).str.to_lowercase().str.contains(val.lower()))
 
-        total_rows = df.height
+        # Exact values (dropdown picks): prunable, and feed the re-layout job
+        lf = filter_equals(lf, equals, columns)
+        record_column_usage(filename, [col for col, values in (equals or {}).items() if values and col in columns])
+
+        total_rows = collect_within_budget(lf.select(pl.len()), estimated_bytes).item()
         
         if total_rows == 0:
             return {
                 "status": "success", "data": [], "total_rows": 0, 
-                "total_pages": 0, "current_page": 1, "columns": df.columns
+                "total_pages": 0, "current_page": 1, "columns": columns
             }
 
         # 2. SMART SORTING (Numeric priority)
-        if sort_by and sort_by in df.columns:
-            try:
-                # Try creating a temporary float column to sort numerically
-                df = df.with_columns(
-                    pl.col(sort_by).cast(pl.Float64, strict=False).alias("_sort_temp")
-                )
-                df = df.sort("_sort_temp", descending=sort_desc).drop("_sort_temp")
-            except Exception:
-                # Fallback to standard text sorting
-                df = df.sort(sort_by, descending=sort_desc)
-
-        # 3. Handle Large Ints (Convert to String for JS safety)
-        for col in df.columns:
-            if df[col].dtype in [pl.Int64, pl.UInt64]:
-                df = df.with_columns(pl.col(col).cast(pl.Utf8))
+        sorted_lf = lf
+        if sort_by and sort_by in columns:
+            # Try creating a temporary float column to sort numerically
+            sorted_lf = lf.with_columns(
+                pl.col(sort_by).cast(pl.Float64, strict=False).alias("_sort_temp")
+            ).sort("_sort_temp", descending=sort_desc).drop("_sort_temp")
 
-        # 4. Pagination
+        # 3. Pagination
         total_pages = (total_rows // page_size) + 1
         if page < 1: page = 1
         offset = (page - 1) * page_size
-        paged_df = df.slice(offset, page_size)
+        try:
+            paged_df = collect_within_budget(sorted_lf.slice(offset, page_size), estimated_bytes)
+        except Exception:
+            if not (sort_by and sort_by in columns):
+                raise
+            # Fallback to standard text sorting
+            paged_df = collect_within_budget(
+                lf.sort(sort_by, descending=sort_desc).slice(offset, page_size), estimated_bytes
+            )
+
+        # 4. Handle Large Ints (Convert to String for JS safety)
+        for col in paged_df.columns:
+            if paged_df[col].dtype in [pl.Int64, pl.UInt64]:
+                paged_df = paged_df.with_columns(pl.col(col).cast(pl.Utf8))
+
+        dtypes = {col: str(paged_df[col].dtype) for col in paged_df.columns}
 
         # 5. Clean "N/A" -> Make them empty strings ""
         paged_df = paged_df.fill_null("").fill_nan("")
@@ -68,8 +68,8 @@ def analyze_dataset(filename: str, page: int = 1, page_size: int = 10, sort_by:
             "total_rows": total_rows,
             "total_pages": total_pages,
             "current_page": page,
-            "columns": df.columns,
-            "dtypes": {col: str(df[col].dtype) for col in df.columns}
+            "columns": paged_df.columns,
+            "dtypes": dtypes
         }
 
     except Exception as e:
@@ -80,23 +80,11 @@ def analyze_dataset(filename: str, page: int = 1, page_size: int = 10, sort_by:
 def get_unique_values(filename: str, column: str):
     print(f"🔍 Fetching unique values for '{column}' in {filename}")
     try:
-        file_buffer = get_parquet_path(filename)
-        
-        # Optimize: Read ONLY the specific column needed
-        df = pl.read_parquet(file_buffer, columns=[column])
-        
-        # Get unique values
-        # 1. Cast to String
-        # 2. Drop Nulls
-        # 3. Get Unique
-        # 4. Sort
-        # 5. Limit to top 100
-        uniques = df.select(
-            pl.col(column).cast(pl.Utf8).drop_nulls().unique().sort().head(100)
-        ).to_series().to_list()
+        # Optimize: Read the column's value index (built at ingest), not the data
+        index = load_value_index(filename, column)
         
-        # Clean list (remove empty strings)
-        clean_values = [v for v in uniques if v.strip() != ""]
+        # First 100 distinct values, alphabetically (empty strings never indexed)
+        clean_values = index.sort("value").head(100)["value"].to_list()
         
         return {"status": "success", "values": clean_values}
         
@@ -0,0 +1,204 @@
+import json
+import time
+import uuid
+import hashlib
+import threading
+from concurrent.futures import Future
+
+import redis
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+
+# ---------------------------------------------------------
+# SINGLE-FLIGHT REQUEST COALESCING
+# ---------------------------------------------------------
+# N identical concurrent queries -> ONE computation.
+#   1. Inside a process: threads share a Future keyed by the query.
+#   2. Across uvicorn workers: the leader takes a Redis lock and publishes
+#      its result; other workers wait for that result instead of recomputing.
+# Results are only shared with requests that were in flight at the same time
+# (each flight has its own id), so this never serves stale data.
+# The leader keeps its lock alive while it computes (heartbeat), so slow
+# out-of-core queries stay single-flight past COALESCE_LOCK_TTL_SECONDS.
+
+LOCK_PREFIX = "coalesce:lock:"
+RESULT_PREFIX = "coalesce:result:"
+
+# A flight that vanished is retried this many times before computing locally
+MAX_FLIGHT_ATTEMPTS = 3
+
+# Compare-and-act: only the flight that owns the lock may extend / release it
+REFRESH_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+
+def get_redis_client():
+    """Helper: Lazily creates the client for the shared lock store."""
+    global _redis_client
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                _redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+    return _redis_client
+
+
+def make_query_key(kind: str, params: dict) -> str:
+    """Builds a stable key from the normalized request parameters."""
+    payload = json.dumps({"kind": kind, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_filters(filters: dict = None):
+    """Drops empty filter values (they are ignored by the query anyway)."""
+    if not filters:
+        return None
+    cleaned = {col: val for col, val in filters.items() if val}
+    return cleaned or None
+
+
+def normalize_equals(equals: dict = None):
+    """Drops empty value lists and orders the values (same query, same key)."""
+    if not equals:
+        return None
+    cleaned = {col: sorted(set(values)) for col, values in equals.items() if values}
+    return cleaned or None
+
+
+def coalesce(kind: str, params: dict, compute):
+    """
+    Runs compute() once for all identical concurrent requests.
+    Followers block until the leader finishes and receive the same result.
+    """
+    if not settings.COALESCE_ENABLED:
+        return compute()
+
+    key = make_query_key(kind, params)
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _inflight[key] = future
+
+    if not is_leader:
+        print(f"🔗 Coalesced {kind} request onto in-flight query {key[:12]}")
+        return future.result()
+
+    try:
+        result = _run_across_workers(kind, key, compute)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _run_across_workers(kind: str, key: str, compute):
+    """Second level of single-flight: one leader per key across all workers."""
+    lock_key = LOCK_PREFIX + key
+    for _ in range(MAX_FLIGHT_ATTEMPTS):
+        try:
+            client = get_redis_client()
+            flight_id = uuid.uuid4().hex
+            acquired = client.set(lock_key, flight_id, nx=True, px=int(settings.COALESCE_LOCK_TTL_SECONDS * 1000))
+        except Exception as e:
+            print(f"⚠️ Coalescing lock store unavailable ({e}). Computing locally...")
+            return compute()
+
+        if acquired:
+            return _lead_flight(client, lock_key, key, flight_id, compute)
+
+        found, result = _wait_for_flight(client, lock_key, key)
+        if found:
+            print(f"🔗 Coalesced {kind} request onto another worker's query {key[:12]}")
+            return result
+        if result is not None:
+            # Lock store lost or wait timed out: stop coordinating
+            break
+        # Leader vanished (crash) without publishing: join / lead the next flight
+        print(f"🔁 Flight for {kind} query {key[:12]} vanished, retrying...")
+
+    return compute()
+
+
+def _heartbeat(client, lock_key: str, flight_id: str, stop: threading.Event):
+    """Extends the leader's lock until stop is set (or the lock is lost)."""
+    ttl_ms = int(settings.COALESCE_LOCK_TTL_SECONDS * 1000)
+    while not stop.wait(settings.COALESCE_LOCK_TTL_SECONDS / 3):
+        try:
+            if not client.eval(REFRESH_LOCK_SCRIPT, 1, lock_key, flight_id, ttl_ms):
+                print(f"⚠️ Coalescing lock {lock_key} lost while computing")
+                return
+        except Exception as e:
+            print(f"⚠️ Could not extend coalescing lock: {e}")
+
+
+def _lead_flight(client, lock_key: str, key: str, flight_id: str, compute):
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(client, lock_key, flight_id, stop), daemon=True)
+    heartbeat.start()
+    try:
+        result = compute()
+        try:
+            client.set(
+                f"{RESULT_PREFIX}{key}:{flight_id}",
+                json.dumps(jsonable_encoder(result)),
+                ex=settings.COALESCE_RESULT_TTL_SECONDS,
+            )
+        except Exception as e:
+            print(f"⚠️ Could not publish coalesced result: {e}")
+        return result
+    finally:
+        stop.set()
+        heartbeat.join()
+        try:
+            # Only release the lock if it is still ours
+            client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, flight_id)
+        except Exception:
+            pass
+
+
+def _wait_for_flight(client, lock_key: str, key: str):
+    """
+    Polls until the current leader publishes a result. Returns (True, result),
+    (False, None) when the flight vanished, or (False, reason) on give-up.
+    """
+    deadline = time.monotonic() + settings.COALESCE_WAIT_TIMEOUT_SECONDS
+    try:
+        flight_id = client.get(lock_key)
+        while flight_id is not None:
+            payload = client.get(f"{RESULT_PREFIX}{key}:{flight_id.decode('utf-8')}")
+            if payload is not None:
+                return True, json.loads(payload)
+            if client.get(lock_key) != flight_id:
+                # Lock released: the result may have landed just before the release
+                payload = client.get(f"{RESULT_PREFIX}{key}:{flight_id.decode('utf-8')}")
+                return (True, json.loads(payload)) if payload is not None else (False, None)
+            if time.monotonic() > deadline:
+                return False, "timeout"
+            time.sleep(settings.COALESCE_POLL_INTERVAL_SECONDS)
+    except Exception as e:
+        print(f"⚠️ Lost contact with coalescing lock store: {e}")
+        return False, "lock store unavailable"
+    return False, None
@@ -0,0 +1,210 @@
+import json
+import threading
+
+import polars as pl
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from app.config import settings
+from app.services.storage_service import minio_client, PROCESSED_BUCKET
+
+# A processed dataset is either:
+#   - a single Parquet object:       "<name>.parquet"
+#   - a fan-out (multi-part) dataset: "<name>.parquet.parts/_manifest.json"
+#                                     + "<name>.parquet.parts/<run id>/part-XXXX.parquet"
+# The ".parts" sibling prefix never collides with the single-file object
+# (MinIO refuses an object that is also a "directory"), and each run writes
+# its parts under a new run id, so swapping the manifest is the only switch.
+MANIFEST_NAME = "_manifest.json"
+PARTS_SUFFIX = ".parts"
+# Intermediate objects of a fan-out job: "_staging/<job id>/..."
+STAGING_PREFIX = "_staging"
+
+
+def parts_prefix(filename: str) -> str:
+    return f"{filename}{PARTS_SUFFIX}/"
+
+
+def manifest_key(filename: str) -> str:
+    return f"{parts_prefix(filename)}{MANIFEST_NAME}"
+
+
+def run_prefix(filename: str, run_id: str) -> str:
+    return f"{parts_prefix(filename)}{run_id}/"
+
+
+def part_key(filename: str, run_id: str, index: int) -> str:
+    return f"{run_prefix(filename, run_id)}part-{index:04d}.parquet"
+
+
+def remove_objects(prefix: str, keep: set = frozenset()):
+    """Deletes every object under a prefix, except the keys in `keep`."""
+    for obj in minio_client.list_objects(PROCESSED_BUCKET, prefix=prefix, recursive=True):
+        if obj.object_name not in keep:
+            minio_client.remove_object(PROCESSED_BUCKET, obj.object_name)
+
+
+def remove_stale_parts(filename: str, manifest: dict):
+    """Drops parts of older runs once `manifest` is the live one."""
+    keep = {part["key"] for part in manifest["parts"]} | {manifest_key(filename)}
+    remove_objects(parts_prefix(filename), keep)
+
+
+def get_manifest(filename: str):
+    """Returns the manifest of a multi-part dataset, or None for single-file datasets."""
+    try:
+        minio_client.stat_object(PROCESSED_BUCKET, filename)
+        return None
+    except Exception:
+        pass
+
+    response = minio_client.get_object(PROCESSED_BUCKET, manifest_key(filename))
+    manifest = json.loads(response.read())
+    response.close()
+    response.release_conn()
+    return manifest
+
+
+# ---------------------------------------------------------
+# OUT-OF-CORE QUERIES (memory budget)
+# ---------------------------------------------------------
+# Queries read the Parquet objects straight from MinIO: only the footers,
+# the projected columns and the row groups that survive predicate pushdown
+# are fetched (ranged GETs). Nothing is copied to local disk.
+_arrow_fs = None
+_arrow_fs_lock = threading.Lock()
+
+
+def storage_options() -> dict:
+    """object_store options for pl.scan_parquet / sink_parquet on MinIO."""
+    scheme = "https" if settings.MINIO_SECURE else "http"
+    return {
+        "aws_access_key_id": settings.MINIO_ACCESS_KEY,
+        "aws_secret_access_key": settings.MINIO_SECRET_KEY,
+        "aws_endpoint_url": f"{scheme}://{settings.MINIO_ENDPOINT}",
+        "aws_region": "us-east-1",
+        "aws_allow_http": "true",
+    }
+
+
+def object_uri(key: str) -> str:
+    return f"s3://{PROCESSED_BUCKET}/{key}"
+
+
+def get_arrow_filesystem():
+    """Helper: pyarrow view of MinIO, used to read Parquet footers only."""
+    global _arrow_fs
+    if _arrow_fs is None:
+        with _arrow_fs_lock:
+            if _arrow_fs is None:
+                _arrow_fs = pafs.S3FileSystem(
+                    access_key=settings.MINIO_ACCESS_KEY,
+                    secret_key=settings.MINIO_SECRET_KEY,
+                    endpoint_override=settings.MINIO_ENDPOINT,
+                    scheme="https" if settings.MINIO_SECURE else "http",
+                    region="us-east-1",
+                )
+    return _arrow_fs
+
+
+def parquet_column_bytes(metadata) -> dict:
+    """Uncompressed size (bytes) of every column, from one Parquet footer."""
+    sizes = {}
+    for rg in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg)
+        for c in range(row_group.num_columns):
+            column = row_group.column(c)
+            sizes[column.path_in_schema] = sizes.get(column.path_in_schema, 0) + column.total_uncompressed_size
+    return sizes
+
+
+def merge_column_bytes(sizes_list) -> dict:
+    merged = {}
+    for sizes in sizes_list:
+        for col, size in sizes.items():
+            merged[col] = merged.get(col, 0) + size
+    return merged
+
+
+def read_column_bytes(keys: list) -> dict:
+    """Column sizes read from the objects' footers (one request per object)."""
+    filesystem = get_arrow_filesystem()
+    sizes_list = []
+    for key in keys:
+        with filesystem.open_input_file(f"{PROCESSED_BUCKET}/{key}") as source:
+            sizes_list.append(parquet_column_bytes(pq.ParquetFile(source).metadata))
+    return merge_column_bytes(sizes_list)
+
+
+def estimate_working_set(column_bytes: dict, columns: list = None) -> int:
+    """Uncompressed size (bytes) of the requested columns."""
+    return sum(size for col, size in column_bytes.items() if columns is None or col in columns)
+
+
+def scan_dataset(filename: str, columns: list = None):
+    """
+    Returns (LazyFrame over the dataset's objects in MinIO, estimated_bytes).
+    `columns` only narrows the memory estimate; projection comes from the query.
+    """
+    manifest = get_manifest(filename)
+    keys = [filename] if manifest is None else [part["key"] for part in manifest["parts"]]
+    if not keys:
+        return pl.LazyFrame(schema={name: pl.Utf8 for name in manifest["columns"]}), 0
+
+    lf = pl.scan_parquet([object_uri(key) for key in keys], storage_options=storage_options())
+
+    # Multi-part datasets carry their column sizes in the manifest: no extra
+    # round trip per part (manifests written before that fall back to footers)
+    column_bytes = manifest.get("column_bytes") if manifest else None
+    if column_bytes is None:
+        column_bytes = read_column_bytes(keys)
+    return lf, estimate_working_set(column_bytes, columns)
+
+
+def collect_within_budget(lf: pl.LazyFrame, estimated_bytes: int) -> pl.DataFrame:
+    """
+    Runs the query in memory when it fits the budget, otherwise on the
+    streaming engine, which processes batches and spills to disk.
+    """
+    budget_bytes = settings.QUERY_MEMORY_BUDGET_MB * 1024 * 1024
+    if estimated_bytes > budget_bytes:
+        print(f"🌊 Working set ~{estimated_bytes // (1024 * 1024)}MB > budget {settings.QUERY_MEMORY_BUDGET_MB}MB: streaming engine")
+        return lf.collect(engine="streaming")
+    return lf.collect()
+
+
+def _parse_values(values: list, dtype) -> pl.Series:
+    """Text values (as shown by the value index) -> the column's type. Unparsable -> null."""
+    text = pl.Series(values, dtype=pl.Utf8)
+    if dtype == pl.Boolean:
+        return text.str.to_lowercase().replace_strict({"true": True, "false": False}, default=None, return_dtype=pl.Boolean)
+    if dtype == pl.Date:
+        return text.str.to_date(strict=False)
+    if isinstance(dtype, pl.Datetime):
+        return text.str.to_datetime(time_unit=dtype.time_unit, time_zone=dtype.time_zone, strict=False)
+    if dtype == pl.Time:
+        return text.str.to_time(strict=False)
+    return text.cast(dtype, strict=False)
+
+
+def filter_equals(lf: pl.LazyFrame, equals: dict, columns: list) -> pl.LazyFrame:
+    """
+    Exact-value filters ({column: [values]}), e.g. values picked from the
+    typeahead dropdown. The column is compared in its stored type, so the
+    predicate is pushed down and row groups are pruned by min/max statistics.
+    """
+    schema = lf.collect_schema()
+    for col, values in (equals or {}).items():
+        if not values or col not in columns:
+            continue
+        try:
+            typed = _parse_values(values, schema[col]).drop_nulls()
+        except Exception:
+            # No text -> type conversion for this dtype
+            typed = None
+        if typed is not None and typed.len() == len(values):
+            lf = lf.filter(pl.col(col).is_in(typed.to_list()))
+        else:
+            # A value does not parse as the column type: compare as text (no pruning)
+            lf = lf.filter(pl.col(col).cast(pl.Utf8).is_in(list(values)))
+    return lf
@@ -0,0 +1,204 @@
+import io
+import json
+import uuid
+import polars as pl
+import pyarrow.parquet as pq
+
+from app.config import settings
+from app.services.storage_service import minio_client, PROCESSED_BUCKET
+from app.services.coalescing_service import get_redis_client
+from app.services.dataset_service import (
+    get_manifest, manifest_key, run_prefix, remove_objects, remove_stale_parts,
+    scan_dataset, object_uri, storage_options, read_column_bytes,
+)
+
+# ---------------------------------------------------------
+# 1. WRITE PROFILES
+# ---------------------------------------------------------
+# fast     -> quick ingest, bigger files (LZ4, small row groups, no page index)
+# balanced -> default for conversions
+# compact  -> smallest files + best pruning (used by the re-layout job)
+WRITE_PROFILES = {
+    "fast": {
+        "compression": "lz4",
+        "compression_level": None,
+        "row_group_size": 128 * 1024,
+        "write_page_index": False,
+        "dictionary_pagesize_limit": 1024 * 1024,
+    },
+    "balanced": {
+        "compression": "zstd",
+        "compression_level": 3,
+        "row_group_size": 256 * 1024,
+        "write_page_index": True,
+        "dictionary_pagesize_limit": 1024 * 1024,
+    },
+    "compact": {
+        "compression": "zstd",
+        "compression_level": 12,
+        "row_group_size": 1024 * 1024,
+        "write_page_index": True,
+        "dictionary_pagesize_limit": 4 * 1024 * 1024,
+    },
+}
+
+USAGE_PREFIX = "layout:usage:"
+SORTED_BY_METADATA_KEY = b"trinity.sorted_by"
+
+
+def get_write_options(profile: str = None) -> dict:
+    """Resolves a profile name (default from settings) + env overrides into pyarrow writer options."""
+    profile = profile or settings.PARQUET_WRITE_PROFILE
+    if profile not in WRITE_PROFILES:
+        raise ValueError(f"Unknown Parquet write profile '{profile}'")
+
+    options = dict(WRITE_PROFILES[profile])
+    if settings.PARQUET_COMPRESSION:
+        options["compression"] = settings.PARQUET_COMPRESSION
+        options["compression_level"] = None
+    if settings.PARQUET_COMPRESSION_LEVEL is not None:
+        options["compression_level"] = settings.PARQUET_COMPRESSION_LEVEL
+    if settings.PARQUET_ROW_GROUP_SIZE:
+        options["row_group_size"] = settings.PARQUET_ROW_GROUP_SIZE
+    return options
+
+
+def write_parquet(df: pl.DataFrame, sink, profile: str = None, sorted_by: list = None):
+    """Writes a DataFrame with min/max statistics, dictionary encoding and the chosen profile."""
+    table = df.to_arrow()
+    if sorted_by:
+        metadata = dict(table.schema.metadata or {})
+        metadata[SORTED_BY_METADATA_KEY] = ",".join(sorted_by).encode("utf-8")
+        table = table.replace_schema_metadata(metadata)
+
+    pq.write_table(
+        table,
+        sink,
+        write_statistics=True,
+        use_dictionary=True,
+        **get_write_options(profile),
+    )
+
+
+# ---------------------------------------------------------
+# 2. COLUMN USAGE (which columns dashboards filter on by exact value)
+# ---------------------------------------------------------
+# Only equality / is_in filters are recorded: those are the predicates that
+# row-group min/max statistics can prune once the data is sorted by the
+# column. Substring filters and group-bys read every row group anyway.
+def record_column_usage(filename: str, columns: list):
+    """Best effort: never fails the query that reports the usage."""
+    columns = [col for col in columns if col]
+    if not columns:
+        return
+    try:
+        pipe = get_redis_client().pipeline()
+        for col in columns:
+            pipe.zincrby(USAGE_PREFIX + filename, 1, col)
+        pipe.execute()
+    except Exception as e:
+        print(f"⚠️ Could not record column usage: {e}")
+
+
+def get_hot_columns(filename: str, limit: int) -> list:
+    try:
+        ranked = get_redis_client().zrevrange(USAGE_PREFIX + filename, 0, limit - 1)
+        return [col.decode("utf-8") for col in ranked]
+    except Exception as e:
+        print(f"⚠️ Could not read column usage: {e}")
+        return []
+
+
+# ---------------------------------------------------------
+# 3. RE-LAYOUT (cluster rows so row-group min/max prunes well)
+# ---------------------------------------------------------
+def relayout_dataset(filename: str, sort_columns: list = None):
+    """
+    Rewrites a processed dataset sorted by its most used equality-filter
+    columns, with the re-layout profile. The sort streams (spilling past the
+    memory budget) into new multi-part files under a fresh run id; swapping
+    the manifest makes them live, then the old objects are removed.
+    """
+    print(f"🧱 Re-layout of {filename}...")
+    run_id = uuid.uuid4().hex
+    output_prefix = run_prefix(filename, run_id)
+    try:
+        manifest = get_manifest(filename)
+        lf, _ = scan_dataset(filename)
+
+        columns = lf.collect_schema().names()
+        if not sort_columns:
+            sort_columns = get_hot_columns(filename, settings.RELAYOUT_MAX_SORT_COLUMNS)
+        sort_columns = [col for col in sort_columns if col in columns]
+        if not sort_columns:
+            return {"status": "error", "message": "No usage recorded yet: pass sort_columns explicitly"}
+
+        # The Polars sink has no page-index / dictionary-size knobs: only
+        # compression and row-group size are taken from the profile
+        options = get_write_options(settings.PARQUET_RELAYOUT_PROFILE)
+        sinked = []
+        lf.sort(sort_columns, nulls_last=True).sink_parquet(
+            pl.PartitionBy(
+                object_uri(output_prefix),
+                file_path_provider=lambda args: f"part-{args.index_in_partition:04d}.parquet",
+                max_rows_per_file=settings.CONVERT_FANOUT_CHUNK_ROWS,
+            ),
+            compression=options["compression"],
+            compression_level=options["compression_level"],
+            row_group_size=options["row_group_size"],
+            statistics=True,
+            metadata={SORTED_BY_METADATA_KEY.decode("utf-8"): ",".join(sort_columns)},
+            storage_options=storage_options(),
+            engine="streaming",
+            sinked_paths_callback=lambda args: sinked.extend(args.paths),
+        )
+
+        bucket_uri = object_uri("")
+        parts = [
+            {"key": path.path[len(bucket_uri):], "rows": path.num_rows}
+            for path in sorted(sinked, key=lambda path: path.path)
+        ]
+        # Reordering rows keeps the column statistics and the value index valid
+        new_manifest = {
+            "dataset": filename,
+            "source": (manifest or {}).get("source", {"relayout_of": filename}),
+            "parts": parts,
+            "rows": sum(part["rows"] for part in parts),
+            "columns": columns,
+            "stats": (manifest or {}).get("stats", {}),
+            # Footers of the new parts are read once here, not on every query
+            "column_bytes": read_column_bytes([part["key"] for part in parts]),
+            "sorted_by": sort_columns,
+        }
+
+        # Swap: the new manifest is live once the single file no longer shadows it
+        data = json.dumps(new_manifest).encode("utf-8")
+        minio_client.put_object(
+            PROCESSED_BUCKET,
+            manifest_key(filename),
+            io.BytesIO(data),
+            length=len(data),
+            content_type="application/json"
+        )
+        if manifest is None:
+            minio_client.remove_object(PROCESSED_BUCKET, filename)
+        remove_stale_parts(filename, new_manifest)
+
+        print(f"✅ Re-layout done: {filename} sorted by {sort_columns} ({len(parts)} parts)")
+        return {
+            "status": "success",
+            "processed_file": filename,
+            "sorted_by": sort_columns,
+            "rows": new_manifest["rows"],
+            "parts": len(parts),
+            "profile": settings.PARQUET_RELAYOUT_PROFILE,
+        }
+
+    except Exception as e:
+        print(f"❌ Re-layout Failed: {e}")
+        # Unreferenced output of this run
+        try:
+            remove_objects(output_prefix)
+        except Exception:
+            pass
+        return {"status": "error", "message": str(e)}
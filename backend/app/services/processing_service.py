@@ -2,8 +2,12 @@ import polars as pl
 import io
 import fastexcel
 import openpyxl
-from xlsx2csv import Xlsx2csv
+from app.config import settings
 from app.services.storage_service import minio_client, RAW_BUCKET, PROCESSED_BUCKET
+from app.services.layout_service import write_parquet
+from app.services.value_index_service import compute_value_counts, replace_value_index
+from app.services.dataset_service import parts_prefix, remove_objects
+from app.worker_utils.excel_readers import NULL_VALUES, read_excel_sheet
 
 def get_file_stream(object_key: str):
     """Helper: Downloads the file stream from MinIO"""
@@ -11,6 +15,20 @@ def get_file_stream(object_key: str):
     response = minio_client.get_object(RAW_BUCKET, object_key)
     return io.BytesIO(response.read())
 
+def clean_dataframe(df: pl.DataFrame) -> pl.DataFrame:
+    """Final Cleanup (FAST VERSION) shared by the single-process and fan-out converters."""
+    # 🚀 Since we handled "" in the reader, we only need ONE fast check now:
+    # Drop rows where ALL columns are null
+    df = df.filter(~pl.all_horizontal(pl.all().is_null()))
+
+    # Clean column names
+    df.columns = [str(col).strip() for col in df.columns]
+    return df
+
+def build_parquet_filename(object_key: str, sheet_name: str) -> str:
+    clean_filename = object_key.replace(".xlsx", "").replace(".csv", "").replace("/", "_")
+    return f"{clean_filename}_{sheet_name}.parquet"
+
 # ---------------------------------------------------------
 # 1. THE SCANNER
 # ---------------------------------------------------------
@@ -51,6 +69,7 @@ def convert_sheet_to_parquet(object_key: str, sheet_name: str):
     try:
         stream = get_file_stream(object_key)
         df = None
+        engine = "csv"
         
         # 🟢 OPTIMIZED CSV PROCESSING
         if object_key.lower().endswith('.csv'):
@@ -60,71 +79,25 @@ def convert_sheet_to_parquet(object_key: str, sheet_name: str):
                 infer_schema_length=10000, 
                 ignore_errors=True,
                 truncate_ragged_lines=True,
-                null_values=["", "null", "NULL", "N/A"] # 👈 AUTO-CLEANING HERE
+                null_values=NULL_VALUES # 👈 AUTO-CLEANING HERE
             )
         
         # 🔵 OPTIMIZED EXCEL PROCESSING
         else:
-            stream.seek(0)
-            csv_buffer = io.StringIO()
-            converter = Xlsx2csv(stream, outputencoding="utf-8", delimiter="\t", skip_empty_lines=True)
-            try:
-                converter.convert(csv_buffer, sheetname=sheet_name)
-            except:
-                print("⚠️ Sheet name match failed, trying index 0...")
-                converter.convert(csv_buffer, sheetid=1)
-
-            csv_buffer.seek(0)
-            
-            # Smart Header Detection
-            full_df = pl.read_csv(
-                io.StringIO(csv_buffer.getvalue()), 
-                separator="\t", 
-                has_header=False, 
-                infer_schema_length=0,
-                truncate_ragged_lines=True,
-                ignore_errors=True
-            )
-
-            header_row_idx = 0
-            for i in range(min(1000, full_df.height)):
-                row = full_df.row(i)
-                non_empty_count = sum(1 for val in row if val and str(val).strip() != "" and str(val).strip() != "null")
-                if non_empty_count > 5 or (len(row) > 0 and non_empty_count > (len(row) * 0.5)):
-                    header_row_idx = i
-                    print(f"✅ Auto-Detected Header at Row: {i+1}")
-                    break
-            
-            # Reload with Auto-Cleaning
-            csv_buffer.seek(0)
-            df = pl.read_csv(
-                io.StringIO(csv_buffer.getvalue()), 
-                separator="\t", 
-                has_header=True, 
-                skip_rows=header_row_idx, 
-                infer_schema_length=0, 
-                ignore_errors=True,
-                truncate_ragged_lines=True,
-                null_values=["", "null", "NULL", "N/A"] # 👈 AUTO-CLEANING HERE
-            )
+            # Native Arrow read (fastexcel), xlsx2csv / openpyxl as automatic fallbacks
+            df, engine = read_excel_sheet(stream.getvalue(), sheet_name, settings.CONVERT_EXCEL_ENGINE)
 
         # -----------------------------------------------------
         # Final Cleanup (FAST VERSION)
         # -----------------------------------------------------
         if df is not None:
-            # 🚀 Since we handled "" in the reader, we only need ONE fast check now:
-            # Drop rows where ALL columns are null
-            df = df.filter(~pl.all_horizontal(pl.all().is_null()))
-            
-            # Clean column names
-            df.columns = [str(col).strip() for col in df.columns]
+            df = clean_dataframe(df)
 
             # Save Parquet
-            clean_filename = object_key.replace(".xlsx", "").replace(".csv", "").replace("/", "_")
-            parquet_filename = f"{clean_filename}_{sheet_name}.parquet"
+            parquet_filename = build_parquet_filename(object_key, sheet_name)
             
             output_buffer = io.BytesIO()
-            df.write_parquet(output_buffer)
+            write_parquet(df, output_buffer)
             output_buffer.seek(0)
             
             minio_client.put_object(
@@ -134,11 +107,21 @@ def convert_sheet_to_parquet(object_key: str, sheet_name: str):
                 length=output_buffer.getbuffer().nbytes,
                 content_type="application/octet-stream"
             )
+
+            # A previous fan-out conversion of the same sheet is now stale
+            remove_objects(parts_prefix(parquet_filename))
+
+            # Typeahead index (sorted distinct values + counts per column)
+            try:
+                replace_value_index(parquet_filename, compute_value_counts(df), df.columns)
+            except Exception as index_error:
+                print(f"⚠️ Value index not built (will be built on first lookup): {index_error}")
             
             return {
                 "status": "success",
                 "original_sheet": sheet_name,
                 "processed_file": parquet_filename,
+                "engine": engine,
                 "rows": df.height,
                 "columns": df.columns
             }
@@ -0,0 +1,220 @@
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+
+import polars as pl
+
+from app.config import settings
+from app.services.storage_service import minio_client, PROCESSED_BUCKET
+from app.services.dataset_service import STAGING_PREFIX, scan_dataset, collect_within_budget, remove_objects
+from app.services.layout_service import write_parquet
+from app.services.coalescing_service import coalesce
+
+# ---------------------------------------------------------
+# TYPEAHEAD INDEX (per-column sorted value dictionary + counts)
+# ---------------------------------------------------------
+# Built at ingest time, stored under a sibling prefix (never under the
+# dataset key itself, which MinIO would refuse while it is an object):
+#   "_values/<name>.parquet/<column hash>.parquet"  -> value | count | value_lower
+# Sorted by value_lower, so a prefix lookup is two binary searches and a
+# substring lookup only scans the distinct values, never the data.
+
+VALUE_INDEX_DIR = "_values"
+
+
+def value_index_prefix(filename: str) -> str:
+    return f"{VALUE_INDEX_DIR}/{filename}/"
+
+
+def value_index_key(filename: str, column: str) -> str:
+    column_hash = hashlib.sha1(column.encode("utf-8")).hexdigest()[:16]
+    return f"{value_index_prefix(filename)}{column_hash}.parquet"
+
+
+def partial_value_counts_key(job_id: str, index: int) -> str:
+    """Per-part value counts written by the fan-out converter, merged by the chord."""
+    return f"{STAGING_PREFIX}/{job_id}/values-part-{index:04d}.parquet"
+
+
+def remove_value_index(filename: str):
+    """Drops every column dictionary of a dataset (its data is being rewritten)."""
+    remove_objects(value_index_prefix(filename))
+
+
+def compute_value_counts(df: pl.DataFrame) -> pl.DataFrame:
+    """Long format (column, value, count) for every column, empty strings dropped."""
+    frames = []
+    for col in df.columns:
+        frames.append(
+            df.select(pl.col(col).cast(pl.Utf8).alias("value"))
+            .drop_nulls()
+            .filter(pl.col("value").str.strip_chars() != "")
+            .group_by("value")
+            .agg(pl.len().cast(pl.Int64).alias("count"))
+            .select(pl.lit(col).alias("column"), "value", "count")
+        )
+    if not frames:
+        return pl.DataFrame(schema={"column": pl.Utf8, "value": pl.Utf8, "count": pl.Int64})
+    return pl.concat(frames)
+
+
+def _put_parquet(df: pl.DataFrame, key: str):
+    output_buffer = io.BytesIO()
+    write_parquet(df, output_buffer)
+    output_buffer.seek(0)
+    minio_client.put_object(
+        PROCESSED_BUCKET,
+        key,
+        output_buffer,
+        length=output_buffer.getbuffer().nbytes,
+        content_type="application/octet-stream"
+    )
+
+
+def write_value_index(filename: str, value_counts: pl.DataFrame, columns: list):
+    """Merges (column, value, count) rows and writes one sorted dictionary per column."""
+    merged = value_counts.group_by("column", "value").agg(pl.col("count").sum())
+    groups = {group["column"][0]: group for group in merged.partition_by("column")}
+    for column in columns:
+        # Columns without any value still get an (empty) dictionary
+        group = groups.get(column, pl.DataFrame(schema={"column": pl.Utf8, "value": pl.Utf8, "count": pl.Int64}))
+        dictionary = (
+            group.select("value", "count")
+            .with_columns(pl.col("value").str.to_lowercase().alias("value_lower"))
+            .sort("value_lower", "value")
+        )
+        _put_parquet(dictionary, value_index_key(filename, column))
+    print(f"🔤 Value index written for {filename}: {len(columns)} columns")
+
+
+def replace_value_index(filename: str, value_counts: pl.DataFrame, columns: list):
+    """New data for the dataset: dictionaries of the previous version (and of dropped columns) go away."""
+    remove_value_index(filename)
+    write_value_index(filename, value_counts, columns)
+
+
+def write_partial_value_counts(job_id: str, index: int, df: pl.DataFrame):
+    _put_parquet(compute_value_counts(df), partial_value_counts_key(job_id, index))
+
+
+def merge_partial_value_counts(filename: str, job_id: str, part_count: int, columns: list):
+    keys = [partial_value_counts_key(job_id, index) for index in range(part_count)]
+    frames = []
+    for key in keys:
+        response = minio_client.get_object(PROCESSED_BUCKET, key)
+        frames.append(pl.read_parquet(io.BytesIO(response.read())))
+        response.close()
+        response.release_conn()
+
+    value_counts = pl.concat(frames) if frames else compute_value_counts(pl.DataFrame())
+    replace_value_index(filename, value_counts, columns)
+    for key in keys:
+        minio_client.remove_object(PROCESSED_BUCKET, key)
+
+
+def build_column_value_index(filename: str, column: str):
+    """Fallback for datasets converted before the index existed: build it once, on demand."""
+    print(f"🔤 Building missing value index for '{column}' in {filename}")
+    lf, estimated_bytes = scan_dataset(filename, columns=[column])
+    if column not in lf.collect_schema().names():
+        raise ValueError(f"Column '{column}' not found")
+    df = collect_within_budget(lf.select(column), estimated_bytes)
+    write_value_index(filename, compute_value_counts(df), [column])
+
+
+# Loaded dictionaries, LRU-evicted by size (VALUE_INDEX_CACHE_MB). The etag is
+# part of the cache key: a re-ingest invalidates the entry.
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def _cache_get(cache_key):
+    with _cache_lock:
+        index = _cache.get(cache_key)
+        if index is not None:
+            _cache.move_to_end(cache_key)
+        return index
+
+
+def _cache_put(cache_key, index: pl.DataFrame):
+    global _cache_bytes
+    budget = settings.VALUE_INDEX_CACHE_MB * 1024 * 1024
+    size = index.estimated_size()
+    if size > budget:
+        # Bigger than the whole cache: served, never kept
+        return
+    with _cache_lock:
+        # Older versions of the same dictionary are dead weight
+        for stale in [k for k in _cache if k[0] == cache_key[0]]:
+            _cache_bytes -= _cache.pop(stale).estimated_size()
+        _cache[cache_key] = index
+        _cache_bytes += size
+        while _cache_bytes > budget:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= evicted.estimated_size()
+
+
+def _load_value_index(key: str, etag: str) -> pl.DataFrame:
+    index = _cache_get((key, etag))
+    if index is not None:
+        return index
+
+    response = minio_client.get_object(PROCESSED_BUCKET, key)
+    data = response.read()
+    response.close()
+    response.release_conn()
+    index = pl.read_parquet(io.BytesIO(data))
+    _cache_put((key, etag), index)
+    return index
+
+
+def load_value_index(filename: str, column: str) -> pl.DataFrame:
+    key = value_index_key(filename, column)
+    try:
+        etag = minio_client.stat_object(PROCESSED_BUCKET, key).etag
+    except Exception:
+        # Concurrent lookups of the same missing index wait for one build
+        coalesce(
+            "value-index-build",
+            {"filename": filename, "column": column},
+            lambda: build_column_value_index(filename, column),
+        )
+        etag = minio_client.stat_object(PROCESSED_BUCKET, key).etag
+    return _load_value_index(key, etag)
+
+
+def search_values(filename: str, column: str, query: str = "", mode: str = "prefix", offset: int = 0, limit: int = 50):
+    """Case-insensitive prefix / substring lookup over the column's distinct values, with counts."""
+    try:
+        index = load_value_index(filename, column)
+        needle = (query or "").lower()
+
+        if not needle:
+            matches = index
+        elif mode == "prefix":
+            # Sorted dictionary: matches are one contiguous range
+            start = index["value_lower"].search_sorted(needle, side="left")
+            end = index["value_lower"].search_sorted(needle + "\U0010ffff", side="left")
+            matches = index.slice(start, end - start)
+        elif mode == "contains":
+            matches = index.filter(pl.col("value_lower").str.contains(needle, literal=True))
+        else:
+            return {"status": "error", "message": "Invalid mode (use 'prefix' or 'contains')"}
+
+        offset = max(offset, 0)
+        page = matches.slice(offset, limit)
+
+        return {
+            "status": "success",
+            "values": page.select("value", "count").to_dicts(),
+            "total_matches": matches.height,
+            "distinct_values": index.height,
+            "offset": offset,
+            "limit": limit,
+        }
+
+    except Exception as e:
+        print(f"❌ Value search failed: {e}")
+        return {"status": "error", "message": str(e)}
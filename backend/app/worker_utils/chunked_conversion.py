@@ -0,0 +1,343 @@
+import io
+import csv
+import json
+import tempfile
+import polars as pl
+import pyarrow.parquet as pq
+from xlsx2csv import Xlsx2csv
+
+from app.services.storage_service import minio_client, RAW_BUCKET, PROCESSED_BUCKET
+from app.services.processing_service import clean_dataframe, build_parquet_filename, get_file_stream
+from app.worker_utils.excel_readers import NULL_VALUES, detect_header_row, _column_names, _normalize_cells
+from app.services.dataset_service import (
+    STAGING_PREFIX, get_manifest, manifest_key, part_key, run_prefix, remove_objects, remove_stale_parts,
+    parquet_column_bytes, merge_column_bytes,
+)
+from app.services.layout_service import write_parquet
+from app.services.value_index_service import write_partial_value_counts, merge_partial_value_counts
+
+# ---------------------------------------------------------
+# FAN-OUT CONVERSION (one big file -> N Parquet parts in parallel)
+# ---------------------------------------------------------
+# plan_chunks()   : split the source into independent chunk specs
+# convert_chunk() : parse ONE chunk -> ONE Parquet part (runs in parallel)
+# write_manifest(): consolidate per-part statistics, value index + list of parts
+#
+# CSV  -> byte ranges aligned to line boundaries (no copy of the data).
+# Excel-> the sheet's row stream (xlsx2csv, the only engine that doesn't
+#         hold the sheet in memory) is cut into TSV chunks staged in MinIO
+#         (an .xlsx is a zip, so rows cannot be addressed by offset). Column
+#         names and cell values follow the single-process readers' rules
+#         (_column_names / _normalize_cells); number formats are rendered
+#         like the xlsx2csv engine (see excel_readers).
+#
+# CSV byte ranges are cut at "\n", so quoted fields that contain line breaks
+# can't be split safely. They are detected (a line with an odd number of
+# quotes) in the planner's sample -> the worker falls back to the
+# single-process converter, and in every chunk -> the job fails instead of
+# writing wrong rows.
+
+ALIGN_WINDOW_BYTES = 64 * 1024
+SCHEMA_SAMPLE_BYTES = 4 * 1024 * 1024
+
+
+def _read_range(object_key: str, offset: int, length: int) -> bytes:
+    response = minio_client.get_object(RAW_BUCKET, object_key, offset=offset, length=length)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def _next_line_start(object_key: str, position: int, size: int) -> int:
+    """Returns the offset of the first line that starts at or after `position`."""
+    offset = position - 1
+    while offset < size:
+        window = _read_range(object_key, offset, min(ALIGN_WINDOW_BYTES, size - offset))
+        idx = window.find(b"\n")
+        if idx != -1:
+            return offset + idx + 1
+        offset += len(window)
+    return size
+
+
+class MultilineFieldError(ValueError):
+    """A quoted CSV field spans several lines: byte-range chunking would corrupt rows."""
+
+
+def _has_multiline_fields(data: bytes) -> bool:
+    # Balanced quoting ("a", "say ""hi""") always puts an even number of
+    # quotes on a line; an odd count means a field continues on the next one
+    return b'"' in data and any(line.count(b'"') % 2 for line in data.split(b"\n"))
+
+
+def _dtype_from_name(name: str):
+    dtype = getattr(pl, name, None)
+    return dtype if isinstance(dtype, type) and issubclass(dtype, pl.DataType) else pl.Utf8
+
+
+# ---------------------------------------------------------
+# 1. PLANNING
+# ---------------------------------------------------------
+def plan_csv_chunks(object_key: str, chunk_bytes: int):
+    size = minio_client.stat_object(RAW_BUCKET, object_key).size
+
+    # Header + schema inferred ONCE so every part gets the same schema
+    sample = _read_range(object_key, 0, min(SCHEMA_SAMPLE_BYTES, size))
+    header_end = sample.find(b"\n") + 1 or len(sample)
+    sample = sample[:sample.rfind(b"\n") + 1] or sample
+    sample_df = pl.read_csv(
+        io.BytesIO(sample),
+        infer_schema_length=10000,
+        ignore_errors=True,
+        truncate_ragged_lines=True,
+        null_values=NULL_VALUES,
+    )
+    if _has_multiline_fields(sample):
+        raise MultilineFieldError(f"{object_key} has quoted fields with line breaks")
+    header = sample[:header_end].decode("utf-8", errors="replace")
+    dtypes = {col: str(dtype) for col, dtype in sample_df.schema.items()}
+
+    chunks = []
+    start = header_end
+    while start < size:
+        end = _next_line_start(object_key, start + chunk_bytes, size)
+        chunks.append({
+            "kind": "csv",
+            "object_key": object_key,
+            "offset": start,
+            "length": end - start,
+            "header": header,
+            "dtypes": dtypes,
+        })
+        start = end
+    return chunks
+
+
+def plan_excel_chunks(object_key: str, sheet_name: str, job_id: str, chunk_rows: int):
+    stream = get_file_stream(object_key)
+    converter = Xlsx2csv(stream, outputencoding="utf-8", delimiter="\t", skip_empty_lines=True)
+
+    with tempfile.NamedTemporaryFile(mode="w+", suffix=".tsv", encoding="utf-8", newline="") as tsv_file:
+        try:
+            converter.convert(tsv_file, sheetname=sheet_name)
+        except:
+            print("⚠️ Sheet name match failed, trying index 0...")
+            tsv_file.seek(0)
+            tsv_file.truncate()
+            converter.convert(tsv_file, sheetid=1)
+
+        # Smart Header Detection (same rule as the single-process converter)
+        tsv_file.seek(0)
+        reader = csv.reader(tsv_file, delimiter="\t")
+        head_rows = []
+        for row in reader:
+            head_rows.append(row)
+            if len(head_rows) >= 1000:
+                break
+        header_row_idx = detect_header_row(head_rows)
+
+        tsv_file.seek(0)
+        reader = csv.reader(tsv_file, delimiter="\t")
+        for _ in range(header_row_idx):
+            next(reader, None)
+        columns = _column_names(next(reader, None) or [])
+
+        chunks = []
+        buffer, writer, rows_in_chunk = None, None, 0
+        for row in reader:
+            if writer is None:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, delimiter="\t")
+            writer.writerow(row)
+            rows_in_chunk += 1
+            if rows_in_chunk >= chunk_rows:
+                chunks.append(_stage_chunk(job_id, len(chunks), buffer, columns))
+                buffer, writer, rows_in_chunk = None, None, 0
+        if writer is not None:
+            chunks.append(_stage_chunk(job_id, len(chunks), buffer, columns))
+    return chunks
+
+
+def _stage_chunk(job_id: str, index: int, buffer: io.StringIO, columns: list):
+    data = buffer.getvalue().encode("utf-8")
+    staging_key = f"{STAGING_PREFIX}/{job_id}/chunk-{index:04d}.tsv"
+    minio_client.put_object(
+        PROCESSED_BUCKET,
+        staging_key,
+        io.BytesIO(data),
+        length=len(data),
+        content_type="text/tab-separated-values",
+    )
+    return {"kind": "excel", "staging_key": staging_key, "columns": columns}
+
+
+def plan_chunks(object_key: str, sheet_name: str, job_id: str, chunk_bytes: int, chunk_rows: int):
+    """Splits a raw file into chunk specs. Each spec gets the target part key."""
+    dataset_name = build_parquet_filename(object_key, sheet_name)
+    if object_key.lower().endswith(".csv"):
+        chunks = plan_csv_chunks(object_key, chunk_bytes)
+    else:
+        chunks = plan_excel_chunks(object_key, sheet_name, job_id, chunk_rows)
+
+    for index, chunk in enumerate(chunks):
+        chunk["index"] = index
+        chunk["dataset"] = dataset_name
+        chunk["job_id"] = job_id
+        chunk["part_key"] = part_key(dataset_name, job_id, index)
+    print(f"🧩 Planned {len(chunks)} chunks for {dataset_name}")
+    return dataset_name, chunks
+
+
+# ---------------------------------------------------------
+# 2. ONE CHUNK -> ONE PART
+# ---------------------------------------------------------
+def _column_stats(df: pl.DataFrame):
+    stats = {}
+    for col in df.columns:
+        series = df[col]
+        entry = {"null_count": series.null_count(), "min": None, "max": None}
+        try:
+            entry["min"] = series.min()
+            entry["max"] = series.max()
+        except Exception:
+            pass
+        stats[col] = entry
+    return json.loads(json.dumps(stats, default=str))
+
+
+def _read_excel_chunk(chunk: dict) -> pl.DataFrame:
+    """Parses a staged TSV chunk like the single-process readers (all String, nulls, normalized cells)."""
+    response = minio_client.get_object(PROCESSED_BUCKET, chunk["staging_key"])
+    data = response.read()
+    response.close()
+    response.release_conn()
+    df = pl.read_csv(
+        io.BytesIO(data),
+        separator="\t",
+        has_header=False,
+        schema={col: pl.Utf8 for col in chunk["columns"]},
+        ignore_errors=True,
+        truncate_ragged_lines=True,
+        null_values=NULL_VALUES,
+    )
+    return _normalize_cells(df)
+
+
+def convert_chunk(chunk: dict):
+    if chunk["kind"] == "csv":
+        body = _read_range(chunk["object_key"], chunk["offset"], chunk["length"])
+        if _has_multiline_fields(body):
+            raise MultilineFieldError(
+                f"Chunk {chunk['index']} of {chunk['object_key']} has quoted fields with line breaks: "
+                "convert this file with distributed=false"
+            )
+        df = pl.read_csv(
+            io.BytesIO(chunk["header"].encode("utf-8") + body),
+            infer_schema_length=0,
+            schema_overrides={col: _dtype_from_name(name) for col, name in chunk["dtypes"].items()},
+            ignore_errors=True,
+            truncate_ragged_lines=True,
+            null_values=NULL_VALUES,
+        )
+    else:
+        df = _read_excel_chunk(chunk)
+
+    df = clean_dataframe(df)
+
+    output_buffer = io.BytesIO()
+    write_parquet(df, output_buffer)
+    output_buffer.seek(0)
+    column_bytes = parquet_column_bytes(pq.ParquetFile(output_buffer).metadata)
+    output_buffer.seek(0)
+    minio_client.put_object(
+        PROCESSED_BUCKET,
+        chunk["part_key"],
+        output_buffer,
+        length=output_buffer.getbuffer().nbytes,
+        content_type="application/octet-stream",
+    )
+
+    # Partial typeahead counts, merged into the value index by the chord
+    write_partial_value_counts(chunk["job_id"], chunk["index"], df)
+
+    if chunk["kind"] == "excel":
+        minio_client.remove_object(PROCESSED_BUCKET, chunk["staging_key"])
+
+    print(f"✅ Part {chunk['index']}: {df.height} rows -> {chunk['part_key']}")
+    return {
+        "index": chunk["index"],
+        "key": chunk["part_key"],
+        "rows": df.height,
+        "columns": df.columns,
+        "stats": _column_stats(df),
+        "column_bytes": column_bytes,
+    }
+
+
+def remove_failed_job(dataset_name: str, job_id: str):
+    """Chord error path: drops the job's staged chunks / value counts and its orphan parts."""
+    remove_objects(f"{STAGING_PREFIX}/{job_id}/")
+    prefix = run_prefix(dataset_name, job_id)
+    try:
+        manifest = get_manifest(dataset_name)
+    except Exception:
+        manifest = None
+    if manifest and any(part["key"].startswith(prefix) for part in manifest["parts"]):
+        # The manifest was swapped before the failure: these parts are live
+        return
+    remove_objects(prefix)
+    print(f"🧹 Removed leftovers of failed job {job_id} for {dataset_name}")
+
+
+# ---------------------------------------------------------
+# 3. MANIFEST + CONSOLIDATED STATISTICS
+# ---------------------------------------------------------
+def _merge_stats(parts):
+    merged = {}
+    for part in parts:
+        for col, entry in part["stats"].items():
+            current = merged.setdefault(col, {"null_count": 0, "min": None, "max": None})
+            current["null_count"] += entry["null_count"]
+            for key, pick in (("min", min), ("max", max)):
+                if entry[key] is None:
+                    continue
+                current[key] = entry[key] if current[key] is None else pick(current[key], entry[key])
+    return merged
+
+
+def write_manifest(dataset_name: str, source: dict, parts: list):
+    parts = sorted(parts, key=lambda part: part["index"])
+    manifest = {
+        "dataset": dataset_name,
+        "source": source,
+        "parts": [{"key": part["key"], "rows": part["rows"]} for part in parts],
+        "rows": sum(part["rows"] for part in parts),
+        "columns": parts[0]["columns"] if parts else [],
+        "stats": _merge_stats(parts),
+        # Memory estimate for queries (read by scan_dataset)
+        "column_bytes": merge_column_bytes(part.get("column_bytes", {}) for part in parts),
+    }
+
+    data = json.dumps(manifest).encode("utf-8")
+    minio_client.put_object(
+        PROCESSED_BUCKET,
+        manifest_key(dataset_name),
+        io.BytesIO(data),
+        length=len(data),
+        content_type="application/json",
+    )
+
+    merge_partial_value_counts(dataset_name, source["job_id"], len(parts), manifest["columns"])
+
+    # A previous single-file conversion would shadow the new parts, and
+    # parts of earlier runs are no longer referenced
+    try:
+        minio_client.remove_object(PROCESSED_BUCKET, dataset_name)
+    except Exception:
+        pass
+    remove_stale_parts(dataset_name, manifest)
+
+    print(f"📦 Manifest written for {dataset_name}: {manifest['rows']} rows in {len(parts)} parts")
+    return manifest
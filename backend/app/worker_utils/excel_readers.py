@@ -0,0 +1,199 @@
+import io
+import os
+import csv
+import tempfile
+import polars as pl
+import fastexcel
+from xlsx2csv import Xlsx2csv
+
+from app.worker_utils.excel_to_csv import convert_xlsx_to_csv
+
+# ---------------------------------------------------------
+# EXCEL READERS (one sheet -> one all-string DataFrame)
+# ---------------------------------------------------------
+# fastexcel : calamine (Rust) reads the sheet straight into Arrow. No text round trip.
+# xlsx2csv  : sheet -> TSV text -> Polars (previous default, .xlsx only)
+# openpyxl  : pure Python, slowest, but the most tolerant of odd files
+#
+# Every reader keeps the same contract as the original xlsx2csv path: Smart
+# Header Detection, pl.read_csv column naming, every column as String and
+# NULL_VALUES turned into nulls. fastexcel and openpyxl give raw values, so
+# _normalize_cells rewrites the ones xlsx2csv renders differently:
+#   - booleans as TRUE/FALSE
+#   - dates (midnight datetimes) as YYYY-MM-DD
+#   - times and durations as HH:MM, time of day only, like xlsx2csv's
+#     h:mm / [h]:mm:ss rendering. fastexcel gives them as datetimes on the
+#     1899-12-31 serial epoch, openpyxl as "13:05:00" / "1 day, 2:00:00".
+#
+# Known differences left between engines:
+#   - Other number formats: xlsx2csv renders 25% / 1,000.00 / a date format
+#     with a time part, or the raw fraction of a day for custom elapsed
+#     formats such as [hh]:mm; fastexcel and openpyxl give the raw value.
+#   - fastexcel and openpyxl can't tell a boolean cell from the text
+#     "true"/"True", a midnight datetime from a date, nor a time from the
+#     text "13:05:00" (or a January 1900 datetime from a duration): both
+#     are normalized the same way.
+#   - fastexcel (calamine) trims text stored without xml:space="preserve".
+#     Excel always sets it, but some writers (openpyxl) leave it off
+#     whitespace-only strings, and those cells come out empty.
+
+# Values treated as empty cells by every reader
+NULL_VALUES = ["", "null", "NULL", "N/A"]
+
+_BOOLEAN_TEXT = {"true": "TRUE", "false": "FALSE", "True": "TRUE", "False": "FALSE"}
+_MIDNIGHT_SUFFIX = r"^(\d{4}-\d{2}-\d{2})[ T]00:00:00$"
+# fastexcel: times / durations as datetimes on the serial epoch
+_SERIAL_TIME = r"^(?:1899-12-31|1900-01-0\d)[ T](\d{2}:\d{2}):\d{2}(?:\.\d+)?$"
+# openpyxl: str(timedelta) -> "1 day, 2:00:00" / "6:00:00", str(time) -> "13:05:00"
+_DAYS_PREFIX = r"^\d+ days?, (\d{1,2}:\d{2}:\d{2})"
+_SHORT_HOUR = r"^(\d:\d{2}:\d{2}(?:\.\d+)?)$"
+_CLOCK_TIME = r"^(\d{2}:\d{2}):\d{2}(?:\.\d+)?$"
+
+
+def detect_header_row(rows) -> int:
+    """
+    Smart Header Detection: returns the index of the first row that looks like
+    a header (more than 5 filled cells, or more than half of the row filled).
+    """
+    for i, row in enumerate(rows):
+        non_empty_count = sum(1 for val in row if val and str(val).strip() != "" and str(val).strip() != "null")
+        if non_empty_count > 5 or (len(row) > 0 and non_empty_count > (len(row) * 0.5)):
+            print(f"✅ Auto-Detected Header at Row: {i+1}")
+            return i
+    return 0
+
+
+def _column_names(header_values) -> list:
+    """Parses the header row exactly like pl.read_csv does (empty -> "", repeated -> name_duplicated_N)."""
+    line = io.StringIO()
+    csv.writer(line, delimiter="\t").writerow("" if value is None else str(value) for value in header_values)
+    line.seek(0)
+    return pl.read_csv(line, separator="\t", has_header=True, n_rows=0, infer_schema_length=0).columns
+
+
+def _normalize_cells(df: pl.DataFrame) -> pl.DataFrame:
+    """Booleans, dates, times and durations rendered like xlsx2csv (see module notes)."""
+    return df.with_columns(
+        pl.col(col)
+        .replace(_BOOLEAN_TEXT)
+        .str.replace(_SERIAL_TIME, "${1}")
+        .str.replace(_DAYS_PREFIX, "${1}")
+        .str.replace(_SHORT_HOUR, "0${1}")
+        .str.replace(_CLOCK_TIME, "${1}")
+        .str.replace(_MIDNIGHT_SUFFIX, "${1}")
+        .alias(col)
+        for col in df.columns
+    )
+
+
+def read_excel_fastexcel(file_bytes: bytes, sheet_name: str) -> pl.DataFrame:
+    reader = fastexcel.read_excel(file_bytes)
+    try:
+        sheet = reader.load_sheet(sheet_name, header_row=None, dtypes="string")
+    except Exception:
+        print("⚠️ Sheet name match failed, trying index 0...")
+        sheet = reader.load_sheet(0, header_row=None, dtypes="string")
+
+    raw = pl.from_arrow(sheet.to_arrow())
+    if raw.width == 0:
+        return pl.DataFrame()
+
+    # Same as xlsx2csv's skip_empty_lines
+    raw = raw.filter(~pl.all_horizontal(pl.all().is_null()))
+    if raw.height == 0:
+        return pl.DataFrame()
+
+    header_row_idx = detect_header_row(raw.head(1000).iter_rows())
+    names = _column_names(raw.row(header_row_idx))
+
+    df = raw.slice(header_row_idx + 1)
+    df.columns = names
+    df = df.with_columns(
+        pl.when(pl.col(col).is_in(NULL_VALUES)).then(None).otherwise(pl.col(col)).alias(col)
+        for col in df.columns
+    )
+    return _normalize_cells(df)
+
+
+def _read_delimited_with_header(text: str, separator: str) -> pl.DataFrame:
+    # Smart Header Detection
+    full_df = pl.read_csv(
+        io.StringIO(text),
+        separator=separator,
+        has_header=False,
+        infer_schema_length=0,
+        truncate_ragged_lines=True,
+        ignore_errors=True
+    )
+
+    header_row_idx = detect_header_row(full_df.row(i) for i in range(min(1000, full_df.height)))
+
+    # Reload with Auto-Cleaning
+    return pl.read_csv(
+        io.StringIO(text),
+        separator=separator,
+        has_header=True,
+        skip_rows=header_row_idx,
+        infer_schema_length=0,
+        ignore_errors=True,
+        truncate_ragged_lines=True,
+        null_values=NULL_VALUES # 👈 AUTO-CLEANING HERE
+    )
+
+
+def read_excel_xlsx2csv(file_bytes: bytes, sheet_name: str) -> pl.DataFrame:
+    csv_buffer = io.StringIO()
+    converter = Xlsx2csv(io.BytesIO(file_bytes), outputencoding="utf-8", delimiter="\t", skip_empty_lines=True)
+    try:
+        converter.convert(csv_buffer, sheetname=sheet_name)
+    except:
+        print("⚠️ Sheet name match failed, trying index 0...")
+        csv_buffer = io.StringIO()
+        converter.convert(csv_buffer, sheetid=1)
+
+    return _read_delimited_with_header(csv_buffer.getvalue(), "\t")
+
+
+def read_excel_openpyxl(file_bytes: bytes, sheet_name: str) -> pl.DataFrame:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xlsx_path = os.path.join(tmp_dir, "source.xlsx")
+        csv_path = os.path.join(tmp_dir, "sheet.csv")
+        with open(xlsx_path, "wb") as f:
+            f.write(file_bytes)
+        try:
+            convert_xlsx_to_csv(xlsx_path, csv_path, sheet_name)
+        except ValueError:
+            print("⚠️ Sheet name match failed, trying index 0...")
+            convert_xlsx_to_csv(xlsx_path, csv_path)
+
+        with open(csv_path, encoding="utf-8") as f:
+            return _normalize_cells(_read_delimited_with_header(f.read(), ","))
+
+
+# Tried in this order when the engine is "auto"
+EXCEL_ENGINES = {
+    "fastexcel": read_excel_fastexcel,
+    "xlsx2csv": read_excel_xlsx2csv,
+    "openpyxl": read_excel_openpyxl,
+}
+
+
+def read_excel_sheet(file_bytes: bytes, sheet_name: str, engine: str = "auto"):
+    """
+    Reads one sheet with the requested engine. With "auto", falls back to the
+    next engine when one fails on this file. Returns (DataFrame, engine used).
+    """
+    if engine != "auto" and engine not in EXCEL_ENGINES:
+        raise ValueError(f"Unknown Excel engine '{engine}'")
+
+    order = list(EXCEL_ENGINES) if engine == "auto" else [engine]
+    last_error = None
+    for name in order:
+        try:
+            df = EXCEL_ENGINES[name](file_bytes, sheet_name)
+            print(f"🚀 Read sheet with {name}: {df.height} rows")
+            return df, name
+        except Exception as e:
+            print(f"⚠️ {name} failed ({e}). Switching engine...")
+            last_error = e
+    raise last_error
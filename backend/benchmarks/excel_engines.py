@@ -0,0 +1,114 @@
+"""
+Side-by-side comparison of the Excel reader engines (throughput + peak memory).
+
+Each engine runs in its own process so peak RSS is not polluted by the
+previous run. No MinIO / env settings are needed.
+
+Usage (from backend/):
+    python -m benchmarks.excel_engines path/to/file.xlsx [sheet_name] [--repeat 3] [--timeout 600]
+
+A run that crashes (e.g. OOM-killed) or exceeds --timeout is reported as a
+failure for that engine.
+"""
+import os
+import sys
+import time
+import queue as queue_module
+import resource
+import argparse
+import multiprocessing as mp
+
+from app.worker_utils.excel_readers import EXCEL_ENGINES
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_engine(engine: str, path: str, sheet_name: str, queue):
+    try:
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+        baseline_mb = _peak_rss_mb()
+
+        start = time.perf_counter()
+        df = EXCEL_ENGINES[engine](file_bytes, sheet_name)
+        elapsed = time.perf_counter() - start
+
+        queue.put({
+            "engine": engine,
+            "seconds": elapsed,
+            "rows": df.height,
+            "columns": df.width,
+            "peak_rss_mb": _peak_rss_mb(),
+            "delta_rss_mb": _peak_rss_mb() - baseline_mb,
+        })
+    except Exception as e:
+        queue.put({"engine": engine, "error": str(e)})
+
+
+def _run_isolated(ctx, engine: str, path: str, sheet_name: str, timeout: float):
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_engine, args=(engine, path, sheet_name, queue))
+    proc.start()
+    deadline = time.monotonic() + timeout
+    try:
+        # Poll so a child that dies without reporting (OOM kill) is noticed
+        while True:
+            try:
+                return queue.get(timeout=1)
+            except queue_module.Empty:
+                if not proc.is_alive():
+                    return {"engine": engine, "error": f"process exited with code {proc.exitcode} (killed / out of memory?)"}
+                if time.monotonic() > deadline:
+                    return {"engine": engine, "error": f"timed out after {timeout:.0f}s"}
+    finally:
+        if proc.is_alive():
+            proc.kill()
+        proc.join()
+
+
+def benchmark(path: str, sheet_name: str, repeat: int, timeout: float = 600):
+    ctx = mp.get_context("spawn")
+    results = []
+    for engine in EXCEL_ENGINES:
+        runs = []
+        for _ in range(repeat):
+            result = _run_isolated(ctx, engine, path, sheet_name, timeout)
+            runs.append(result)
+            if "error" in result:
+                break
+        # Keep the fastest run (least noise), memory is stable between runs
+        ok = [run for run in runs if "error" not in run]
+        results.append(min(ok, key=lambda run: run["seconds"]) if ok else runs[-1])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("sheet_name", nargs="?", default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=600, help="seconds per run before it counts as failed")
+    args = parser.parse_args()
+
+    size_mb = os.path.getsize(args.path) / (1024 * 1024)
+    print(f"📄 {args.path} ({size_mb:.1f} MB), sheet={args.sheet_name or '<first>'}, best of {args.repeat}\n")
+    print(f"{'engine':<10} {'seconds':>9} {'rows':>10} {'rows/s':>12} {'MB/s':>8} {'peak MB':>9} {'delta MB':>9}")
+
+    for result in benchmark(args.path, args.sheet_name or 0, args.repeat, args.timeout):
+        if "error" in result:
+            print(f"{result['engine']:<10} ❌ {result['error']}")
+            continue
+        seconds = result["seconds"]
+        print(
+            f"{result['engine']:<10} {seconds:>9.2f} {result['rows']:>10} "
+            f"{result['rows'] / seconds:>12,.0f} {size_mb / seconds:>8.1f} "
+            f"{result['peak_rss_mb']:>9.0f} {result['delta_rss_mb']:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import io
+import json
+
+import polars as pl
+import pytest
+
+from app.services import dataset_service
+from app.worker_utils import chunked_conversion
+
+
+class FakeObject:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class FakeStat:
+    def __init__(self, size: int):
+        self.size = size
+
+
+class FakeListed:
+    def __init__(self, name: str):
+        self.object_name = name
+
+
+class FakeMinio:
+    """In-memory stand-in for the ranged reads the planner does."""
+
+    def __init__(self, objects: dict):
+        self.objects = objects
+        self.range_reads = 0
+
+    def stat_object(self, bucket, key):
+        return FakeStat(len(self.objects[key]))
+
+    def get_object(self, bucket, key, offset=0, length=0):
+        self.range_reads += 1
+        data = self.objects[key]
+        end = offset + length if length else len(data)
+        return FakeObject(data[offset:end])
+
+    def put_object(self, bucket, key, stream, length, content_type=None):
+        self.objects[key] = stream.read(length)
+
+    def list_objects(self, bucket, prefix="", recursive=False):
+        return [FakeListed(key) for key in sorted(self.objects) if key.startswith(prefix)]
+
+    def remove_object(self, bucket, key):
+        del self.objects[key]
+
+
+@pytest.fixture
+def fake_minio(monkeypatch):
+    def install(data: bytes):
+        client = FakeMinio({"data.csv": data})
+        monkeypatch.setattr(chunked_conversion, "minio_client", client)
+        return client
+    return install
+
+
+def make_csv(rows: int, newline: str = "\n", trailing_newline: bool = True) -> bytes:
+    lines = ["id,name,amount"] + [f"{i},name-{i},{i * 1.5}" for i in range(rows)]
+    text = newline.join(lines) + (newline if trailing_newline else "")
+    return text.encode("utf-8")
+
+
+def read_chunks(data: bytes, chunks: list) -> pl.DataFrame:
+    frames = []
+    for chunk in chunks:
+        body = data[chunk["offset"]:chunk["offset"] + chunk["length"]]
+        frames.append(pl.read_csv(io.BytesIO(chunk["header"].encode("utf-8") + body)))
+    return pl.concat(frames)
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("trailing_newline", [True, False])
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 100, 1000, 10**9])
+def test_plan_csv_chunks_covers_body_on_line_boundaries(fake_minio, newline, trailing_newline, chunk_bytes):
+    data = make_csv(200, newline, trailing_newline)
+    fake_minio(data)
+
+    chunks = chunked_conversion.plan_csv_chunks("data.csv", chunk_bytes)
+
+    header_end = data.index(b"\n") + 1
+    assert chunks[0]["offset"] == header_end
+    assert chunks[0]["header"].encode("utf-8") == data[:header_end]
+
+    # Contiguous, non-overlapping, up to EOF
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current["offset"] == previous["offset"] + previous["length"]
+    assert chunks[-1]["offset"] + chunks[-1]["length"] == len(data)
+
+    # Every chunk but the last ends right after a newline (never mid-line)
+    for chunk in chunks[:-1]:
+        assert chunk["length"] > 0
+        assert data[chunk["offset"] + chunk["length"] - 1:chunk["offset"] + chunk["length"]] == b"\n"
+
+    expected = pl.read_csv(io.BytesIO(data))
+    assert read_chunks(data, chunks).equals(expected)
+
+
+def test_plan_csv_chunks_uses_chunk_size(fake_minio):
+    data = make_csv(10_000)
+    fake_minio(data)
+
+    chunks = chunked_conversion.plan_csv_chunks("data.csv", 16 * 1024)
+
+    assert len(chunks) == pytest.approx(len(data) / (16 * 1024), abs=1)
+    assert all(chunk["length"] >= 16 * 1024 for chunk in chunks[:-1])
+
+
+def test_plan_csv_chunks_header_only(fake_minio):
+    fake_minio(b"id,name\n")
+    assert chunked_conversion.plan_csv_chunks("data.csv", 10) == []
+
+
+def test_plan_csv_chunks_shares_inferred_schema(fake_minio):
+    fake_minio(make_csv(50))
+    chunks = chunked_conversion.plan_csv_chunks("data.csv", 64)
+    assert {chunk["dtypes"]["amount"] for chunk in chunks} == {"Float64"}
+
+
+def test_next_line_start_scans_across_windows(fake_minio, monkeypatch):
+    monkeypatch.setattr(chunked_conversion, "ALIGN_WINDOW_BYTES", 4)
+    data = b"h\n" + b"x" * 50 + b"\nyy\n"
+    client = fake_minio(data)
+
+    assert chunked_conversion._next_line_start("data.csv", 3, len(data)) == 53
+    assert client.range_reads > 1
+
+
+def test_next_line_start_at_boundary_and_eof(fake_minio):
+    data = b"ab\ncd\nef"
+    fake_minio(data)
+
+    # A position that already starts a line stays put
+    assert chunked_conversion._next_line_start("data.csv", 3, len(data)) == 3
+    assert chunked_conversion._next_line_start("data.csv", 4, len(data)) == 6
+    # No newline after the position: the range runs to EOF
+    assert chunked_conversion._next_line_start("data.csv", 7, len(data)) == len(data)
+    assert chunked_conversion._next_line_start("data.csv", 100, len(data)) == len(data)
+
+
+def test_excel_chunks_match_the_single_process_reader(monkeypatch):
+    import datetime
+    import openpyxl
+    from app.worker_utils.excel_readers import read_excel_sheet
+
+    wb = openpyxl.Workbook()
+    wb.active.title = "Data"
+    wb.active.append(["Report"])
+    wb.active.append(["id", "", "id", "flag", "at"])
+    for i in range(25):
+        wb.active.append([i, f"v{i}" if i % 3 else "N/A", i * 2, i % 2 == 0, datetime.time(i % 24, 5)])
+        wb.active.cell(i + 3, 5).number_format = "h:mm"
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    data = buffer.getvalue()
+
+    client = FakeMinio({})
+    monkeypatch.setattr(chunked_conversion, "minio_client", client)
+    monkeypatch.setattr(chunked_conversion, "get_file_stream", lambda key: io.BytesIO(data))
+
+    chunks = chunked_conversion.plan_excel_chunks("book.xlsx", "Data", "job1", chunk_rows=10)
+    assert len(chunks) == 3
+
+    # Staged as TSV text: the planner never holds the whole sheet
+    assert all(chunk["staging_key"].endswith(".tsv") for chunk in chunks)
+    staged = pl.concat(chunked_conversion._read_excel_chunk(chunk) for chunk in chunks)
+    expected, engine = read_excel_sheet(data, "Data")
+    assert engine == "fastexcel"
+    assert staged.columns == ["id", "", "id_duplicated_0", "flag", "at"]
+    assert staged.equals(expected)
+
+
+def test_multiline_detection_ignores_balanced_quotes():
+    assert not chunked_conversion._has_multiline_fields(b'id,note\n1,"a, b"\n2,"say ""hi"""\n')
+    assert chunked_conversion._has_multiline_fields(b'id,note\n1,"line one\nline two"\n')
+
+
+def test_plan_csv_chunks_rejects_multiline_fields(fake_minio):
+    fake_minio(b'id,note\n1,"first line\nsecond line"\n2,plain\n')
+    with pytest.raises(chunked_conversion.MultilineFieldError):
+        chunked_conversion.plan_csv_chunks("data.csv", 8)
+
+
+def test_convert_chunk_rejects_multiline_fields_past_the_sample(fake_minio):
+    # Beyond the planner's sample: the chunk itself must refuse to parse
+    client = fake_minio(b'id,note\n1,"first line\nsecond line"\n')
+    chunk = {
+        "kind": "csv", "object_key": "data.csv", "offset": 8, "length": len(client.objects["data.csv"]) - 8,
+        "header": "id,note\n", "dtypes": {}, "index": 0, "part_key": "unused",
+    }
+    with pytest.raises(chunked_conversion.MultilineFieldError):
+        chunked_conversion.convert_chunk(chunk)
+    assert "unused" not in client.objects
+
+
+@pytest.mark.parametrize("live_run", ["old", "job1"])
+def test_remove_failed_job_keeps_live_parts(monkeypatch, live_run):
+    name = "big_Sheet1.parquet"
+    client = FakeMinio({
+        "_staging/job1/chunk-0000.parquet": b"x",
+        "_staging/job1/values-part-0000.parquet": b"x",
+        "_staging/job2/chunk-0000.parquet": b"x",
+        dataset_service.part_key(name, "job1", 0): b"x",
+        dataset_service.part_key(name, "old", 0): b"x",
+        dataset_service.manifest_key(name): json.dumps(
+            {"parts": [{"key": dataset_service.part_key(name, live_run, 0), "rows": 1}]}
+        ).encode("utf-8"),
+    })
+    monkeypatch.setattr(dataset_service, "minio_client", client)
+
+    chunked_conversion.remove_failed_job(name, "job1")
+
+    assert not any(key.startswith("_staging/job1/") for key in client.objects)
+    assert "_staging/job2/chunk-0000.parquet" in client.objects
+    assert dataset_service.part_key(name, "old", 0) in client.objects
+    assert (dataset_service.part_key(name, "job1", 0) in client.objects) == (live_run == "job1")
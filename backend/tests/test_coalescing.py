@@ -0,0 +1,164 @@
+import time
+import threading
+
+import pytest
+
+from app.services import coalescing_service
+
+
+class FakeRedis:
+    """Thread-safe in-memory subset of redis-py used by the coalescer (with expiry)."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def set(self, key, value, nx=False, ex=None, px=None):
+        with self.lock:
+            if nx and self._live(key) is not None:
+                return None
+            ttl = px / 1000 if px is not None else ex
+            value = value if isinstance(value, bytes) else str(value).encode("utf-8")
+            self.data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+            return True
+
+    def get(self, key):
+        with self.lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def eval(self, script, numkeys, key, flight_id, *args):
+        with self.lock:
+            entry = self._live(key)
+            if entry is None or entry[0] != flight_id.encode("utf-8"):
+                return 0
+            if script == coalescing_service.REFRESH_LOCK_SCRIPT:
+                self.data[key] = (entry[0], time.monotonic() + int(args[0]) / 1000)
+            else:
+                del self.data[key]
+            return 1
+
+
+class DownRedis:
+    def set(self, *args, **kwargs):
+        raise ConnectionError("redis is down")
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(coalescing_service, "get_redis_client", lambda: client)
+    monkeypatch.setattr(coalescing_service.settings, "COALESCE_ENABLED", True)
+    monkeypatch.setattr(coalescing_service.settings, "COALESCE_POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(coalescing_service.settings, "COALESCE_WAIT_TIMEOUT_SECONDS", 10.0)
+    return client
+
+
+def run_concurrently(count: int, target):
+    results, errors = [None] * count, [None] * count
+
+    def run(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def slow_compute(calls: list, seconds: float = 0.3, result=None):
+    def compute():
+        calls.append(1)
+        time.sleep(seconds)
+        return result if result is not None else {"status": "success", "rows": 42}
+    return compute
+
+
+def test_in_process_single_flight(redis_client):
+    calls = []
+    compute = slow_compute(calls)
+    results, errors = run_concurrently(8, lambda: coalescing_service.coalesce("view", {"f": "a"}, compute))
+    assert errors == [None] * 8
+    assert results == [{"status": "success", "rows": 42}] * 8
+    assert len(calls) == 1
+
+
+def test_different_queries_do_not_coalesce(redis_client):
+    calls = []
+    compute = slow_compute(calls, seconds=0.1)
+    counter = iter(range(4))
+    run_concurrently(4, lambda: coalescing_service.coalesce("view", {"page": next(counter)}, compute))
+    assert len(calls) == 4
+
+
+def test_exception_reaches_every_follower(redis_client):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        raise ValueError("boom")
+
+    results, errors = run_concurrently(5, lambda: coalescing_service.coalesce("view", {"f": "b"}, compute))
+    assert len(calls) == 1
+    assert all(isinstance(error, ValueError) and str(error) == "boom" for error in errors)
+    # Nothing left behind for the next request
+    assert coalescing_service._inflight == {}
+    assert redis_client.get(coalescing_service.LOCK_PREFIX + coalescing_service.make_query_key("view", {"f": "b"})) is None
+
+
+def test_lock_store_down_computes_locally(monkeypatch, redis_client):
+    monkeypatch.setattr(coalescing_service, "get_redis_client", lambda: DownRedis())
+    calls = []
+    assert coalescing_service.coalesce("view", {"f": "c"}, slow_compute(calls, 0)) == {"status": "success", "rows": 42}
+    assert len(calls) == 1
+
+
+def test_cross_worker_handoff_outlives_the_lock_ttl(monkeypatch, redis_client):
+    # Leader runs 4x the lock TTL: the heartbeat must keep followers waiting
+    monkeypatch.setattr(coalescing_service.settings, "COALESCE_LOCK_TTL_SECONDS", 0.3)
+    key = coalescing_service.make_query_key("aggregate", {"g": "x"})
+    leader_calls, follower_calls = [], []
+
+    # _run_across_workers directly: each thread acts as a separate uvicorn worker
+    leader = threading.Thread(target=coalescing_service._run_across_workers, args=(
+        "aggregate", key, slow_compute(leader_calls, 1.2, {"worker": "leader"}),
+    ))
+    leader.start()
+    time.sleep(0.1)
+    results, errors = run_concurrently(3, lambda: coalescing_service._run_across_workers(
+        "aggregate", key, slow_compute(follower_calls, 0, {"worker": "follower"}),
+    ))
+    leader.join()
+
+    assert errors == [None] * 3
+    assert results == [{"worker": "leader"}] * 3
+    assert len(leader_calls) == 1
+    assert follower_calls == []
+
+
+def test_vanished_flight_is_retried_not_computed_by_every_follower(monkeypatch, redis_client):
+    monkeypatch.setattr(coalescing_service.settings, "COALESCE_LOCK_TTL_SECONDS", 0.3)
+    key = coalescing_service.make_query_key("view", {"f": "d"})
+    # A leader that crashed: its lock expires without any result
+    redis_client.set(coalescing_service.LOCK_PREFIX + key, "dead-flight", px=200)
+
+    calls = []
+    results, errors = run_concurrently(4, lambda: coalescing_service._run_across_workers(
+        "view", key, slow_compute(calls, 0.5),
+    ))
+    assert errors == [None] * 4
+    assert results == [{"status": "success", "rows": 42}] * 4
+    assert len(calls) == 1
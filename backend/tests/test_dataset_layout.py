@@ -0,0 +1,119 @@
+import re
+import datetime
+
+import polars as pl
+import pytest
+import pyarrow.parquet as pq
+
+from app.services import dataset_service
+
+
+def test_multi_part_keys_never_nest_under_the_single_file_name():
+    # MinIO rejects "<name>.parquet/..." while "<name>.parquet" is an object
+    name = "sales_Sheet1.parquet"
+    keys = [
+        dataset_service.manifest_key(name),
+        dataset_service.part_key(name, "run1", 0),
+    ]
+    assert all(not key.startswith(name + "/") for key in keys)
+    assert all(key.startswith(dataset_service.parts_prefix(name)) for key in keys)
+
+
+def test_runs_write_distinct_part_keys():
+    name = "sales_Sheet1.parquet"
+    assert dataset_service.part_key(name, "run1", 0) != dataset_service.part_key(name, "run2", 0)
+
+
+def _sorted_dataset(path):
+    # 10 row groups of 100 rows, sorted by "code" (what the re-layout produces)
+    df = pl.DataFrame({
+        "code": [f"v{i:03d}" for i in range(1000)],
+        "amount": list(range(1000)),
+    })
+    pq.write_table(df.to_arrow(), path, row_group_size=100)
+    return pl.scan_parquet(path)
+
+
+def _row_groups_read(capfd, lf):
+    with pl.Config(verbose=True):
+        df = lf.collect()
+    match = re.search(r"reading (\d+) / (\d+) row groups", capfd.readouterr().err)
+    return df, int(match.group(1))
+
+
+def test_equality_filters_prune_row_groups(tmp_path, capfd):
+    lf = _sorted_dataset(tmp_path / "d.parquet")
+    columns = lf.collect_schema().names()
+
+    df, read = _row_groups_read(capfd, dataset_service.filter_equals(lf, {"code": ["v350", "v351"]}, columns))
+    assert df["amount"].to_list() == [350, 351]
+    assert read == 1
+
+    # Values arrive as text: compared in the column's own type, still pruned
+    df, read = _row_groups_read(capfd, dataset_service.filter_equals(lf, {"amount": ["720"]}, columns))
+    assert df["code"].to_list() == ["v720"]
+    assert read == 1
+
+
+def test_substring_filters_cannot_prune(tmp_path, capfd):
+    lf = _sorted_dataset(tmp_path / "d.parquet")
+    df, read = _row_groups_read(capfd, lf.filter(pl.col("code").str.contains("v35")))
+    assert df.height == 10
+    assert read == 10
+
+
+def test_unparsable_equality_values_fall_back_to_text(tmp_path):
+    lf = _sorted_dataset(tmp_path / "d.parquet")
+    df = dataset_service.filter_equals(lf, {"amount": ["7", "n/a"]}, ["code", "amount"]).collect()
+    assert df["code"].to_list() == ["v007"]
+
+
+@pytest.mark.parametrize("column, values, expected_ids", [
+    ("active", ["true"], [1, 3]),
+    ("active", ["false", "true"], [1, 2, 3]),
+    ("day", ["2024-01-05"], [1]),
+    ("stamp", ["2024-01-05 13:30:00.000000"], [1]),
+    ("stamp_utc", ["2024-01-05 13:30:00.000000+00:00"], [1]),
+    ("at", ["13:05:00"], [2]),
+    ("amount", ["2.5"], [2]),
+])
+def test_equality_filters_on_typed_columns(tmp_path, column, values, expected_ids):
+    # Values exactly as the value index (and so the dropdown) renders them
+    df = pl.DataFrame({
+        "id": [1, 2, 3],
+        "active": [True, False, True],
+        "day": [datetime.date(2024, 1, 5), datetime.date(2024, 2, 1), None],
+        "stamp": [datetime.datetime(2024, 1, 5, 13, 30), datetime.datetime(2024, 2, 1), None],
+        "at": [datetime.time(9, 0), datetime.time(13, 5), None],
+        "amount": [1.0, 2.5, None],
+    }).with_columns(pl.col("stamp").dt.replace_time_zone("UTC").alias("stamp_utc"))
+    path = tmp_path / "typed.parquet"
+    df.write_parquet(path)
+    lf = pl.scan_parquet(path)
+
+    rendered = df.select(pl.col(column).cast(pl.Utf8)).to_series().drop_nulls().to_list()
+    assert set(values) <= set(rendered)
+
+    result = dataset_service.filter_equals(lf, {column: values}, df.columns).collect()
+    assert sorted(result["id"].to_list()) == expected_ids
+
+
+def test_boolean_equality_filter_through_analysis(tmp_path, monkeypatch):
+    import io
+    from app.services import analysis_service, aggregation_service
+
+    df = pl.read_csv(io.StringIO("id,active,region\n1,true,N\n2,false,S\n3,true,N\n"))
+    assert df.schema["active"] == pl.Boolean
+    path = tmp_path / "flags.parquet"
+    df.write_parquet(path)
+    for module in (analysis_service, aggregation_service):
+        monkeypatch.setattr(module, "scan_dataset", lambda filename, columns=None: (pl.scan_parquet(path), 0))
+        monkeypatch.setattr(module, "record_column_usage", lambda filename, columns: None)
+
+    view = analysis_service.analyze_dataset("flags.parquet", equals={"active": ["true"]})
+    assert view["status"] == "success"
+    assert view["total_rows"] == 2
+
+    chart = aggregation_service.perform_aggregation("flags.parquet", "region", "count", "id", equals={"active": ["false"]})
+    assert chart["status"] == "success"
+    assert chart["data"] == [{"region": "S", "count_id": 1}]
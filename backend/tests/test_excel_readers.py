@@ -0,0 +1,92 @@
+import io
+import os
+import time
+import zipfile
+import datetime
+import multiprocessing as mp
+
+import openpyxl
+import pytest
+
+from app.worker_utils import excel_readers
+from benchmarks import excel_engines
+
+
+def _preserve_whitespace(data: bytes) -> bytes:
+    # openpyxl leaves xml:space="preserve" off whitespace-only strings, Excel always sets it
+    source = zipfile.ZipFile(io.BytesIO(data))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as target:
+        for item in source.infolist():
+            content = source.read(item)
+            if item.filename.startswith("xl/worksheets/"):
+                content = content.replace(b"<t>  </t>", b'<t xml:space="preserve">  </t>')
+            target.writestr(item, content)
+    return buffer.getvalue()
+
+
+def _workbook() -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append(["Monthly export"])
+    ws.append(["id", "", "name", "id", "", "flag", "day", "stamp", "amount", "note", "at", "took"])
+    ws.append([
+        1, "x", "Ann", 2, "y", True, datetime.date(2024, 1, 5), datetime.datetime(2024, 1, 5, 13, 30), 1.5, "N/A",
+        datetime.time(13, 5, 30), datetime.timedelta(hours=6),
+    ])
+    ws.append([
+        2, None, "Bob", 3, "", False, datetime.datetime(2024, 2, 1), datetime.datetime(2024, 2, 1, 0, 0, 1), 10, "  ",
+        datetime.time(0, 0), datetime.timedelta(days=1, hours=2, minutes=30),
+    ])
+    ws.append(["  "] * 12)
+    for row in (3, 4):
+        ws.cell(row, 7).number_format = "yyyy-mm-dd"
+        ws.cell(row, 8).number_format = "yyyy-mm-dd hh:mm:ss"
+        ws.cell(row, 11).number_format = "h:mm:ss"
+        ws.cell(row, 12).number_format = "[h]:mm:ss"
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return _preserve_whitespace(buffer.getvalue())
+
+
+def test_engines_produce_the_same_frame():
+    data = _workbook()
+    # xlsx2csv is the original converter: the reference output
+    expected = excel_readers.read_excel_xlsx2csv(data, "Data")
+    assert expected.columns == [
+        "id", "", "name", "id_duplicated_0", "_duplicated_0", "flag", "day", "stamp", "amount", "note", "at", "took",
+    ]
+    assert expected.rows() == [
+        ("1", "x", "Ann", "2", "y", "TRUE", "2024-01-05", "2024-01-05 13:30:00", "1.5", None, "13:05", "06:00"),
+        ("2", None, "Bob", "3", None, "FALSE", "2024-02-01", "2024-02-01 00:00:01", "10", "  ", "00:00", "02:30"),
+        ("  ",) * 12,
+    ]
+
+    for engine in ("fastexcel", "openpyxl"):
+        df = excel_readers.EXCEL_ENGINES[engine](data, "Data")
+        assert df.columns == expected.columns, engine
+        assert df.rows() == expected.rows(), engine
+
+
+def test_column_names_follow_read_csv():
+    assert excel_readers._column_names(["a", None, "a", "", "tab\there"]) == [
+        "a", "", "a_duplicated_0", "_duplicated_0", "tab\there",
+    ]
+
+
+def _crash(*args):
+    os._exit(137)
+
+
+def _hang(*args):
+    time.sleep(60)
+
+
+@pytest.mark.parametrize("target, message", [(_crash, "code 137"), (_hang, "timed out")])
+def test_benchmark_reports_dead_or_stuck_runs(monkeypatch, target, message):
+    # fork: the child runs the patched target
+    monkeypatch.setattr(excel_engines, "_run_engine", target)
+    result = excel_engines._run_isolated(mp.get_context("fork"), "fastexcel", "unused.xlsx", 0, timeout=2)
+    assert result["engine"] == "fastexcel"
+    assert message in result["error"]
@@ -0,0 +1,120 @@
+import os
+import re
+import subprocess
+import sys
+
+import polars as pl
+
+from app.services import analysis_service, dataset_service
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SPILL_SCRIPT = """
+from app.services.dataset_service import collect_within_budget
+import polars as pl
+
+n = 2_000_000
+lf = pl.LazyFrame().select(pl.int_range(0, n).alias("i")).with_columns(
+    k=(pl.col("i") * 7919) % 500_000,
+    v=(pl.col("i") * 104729) % 1_000_003,
+)
+grouped = lf.group_by("k").agg(pl.col("v").sum()).sort("k")
+ordered = lf.sort("v", "i").select("i")
+
+# Estimate above the 4MB budget -> streaming engine
+assert collect_within_budget(grouped, 1 << 40).equals(grouped.collect())
+assert collect_within_budget(ordered, 1 << 40).equals(ordered.collect())
+"""
+
+
+def test_streaming_engine_spills_group_by_and_sort(tmp_path):
+    # app/__init__.py must hand the budget to Polars before it is imported
+    env = {key: value for key, value in os.environ.items() if not key.startswith("POLARS_OOC_")}
+    env.update({
+        "QUERY_MEMORY_BUDGET_MB": "4",
+        "QUERY_SPILL_DIR": str(tmp_path / "spill"),
+        "POLARS_OOC_LOG_METRICS": "1",
+    })
+    result = subprocess.run(
+        [sys.executable, "-c", SPILL_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stderr
+    assert re.search(r"spill_stats\(group-by\).*spill\(succ=[^,]*, n=[1-9]", result.stderr)
+    assert re.search(r"spill_stats\(sort\).*spill\(succ=[^,]*, n=[1-9]", result.stderr)
+
+
+def _patch_scan(monkeypatch, lf, collect):
+    monkeypatch.setattr(analysis_service, "scan_dataset", lambda filename, columns=None: (lf, 0))
+    monkeypatch.setattr(analysis_service, "collect_within_budget", collect)
+
+
+def test_page_errors_are_not_masked_without_sort(monkeypatch):
+    calls = []
+
+    def collect(lf, estimated_bytes):
+        calls.append(lf)
+        if len(calls) > 1:
+            raise RuntimeError("page failed")
+        return lf.collect()
+
+    _patch_scan(monkeypatch, pl.LazyFrame({"a": ["x", "y"]}), collect)
+    result = analysis_service.analyze_dataset("d.parquet", sort_by=None)
+    assert result == {"status": "error", "message": "page failed"}
+    assert len(calls) == 2
+
+
+def test_sort_falls_back_to_text_order(monkeypatch):
+    def collect(lf, estimated_bytes):
+        if "_sort_temp" in str(lf.explain()):
+            raise RuntimeError("numeric sort failed")
+        return lf.collect()
+
+    _patch_scan(monkeypatch, pl.LazyFrame({"a": ["b", "c", "a"]}), collect)
+    result = analysis_service.analyze_dataset("d.parquet", sort_by="a")
+    assert result["status"] == "success"
+    assert [row["a"] for row in result["data"]] == ["a", "b", "c"]
+
+
+def test_dotenv_budget_reaches_polars(tmp_path):
+    # Settings reads .env: the budget Polars enforces must come from it too
+    (tmp_path / ".env").write_text(f"QUERY_MEMORY_BUDGET_MB=7\nQUERY_SPILL_DIR={tmp_path / 'dotenv-spill'}\n")
+    env = {
+        key: value for key, value in os.environ.items()
+        if not key.startswith("POLARS_OOC_") and not key.startswith("QUERY_")
+    }
+    env["PYTHONPATH"] = BACKEND_DIR
+    script = (
+        "import os; from app.config import settings; "
+        "print(os.environ['POLARS_OOC_MEMORY_BUDGET_MB'], settings.QUERY_MEMORY_BUDGET_MB, "
+        "os.path.isdir(settings.QUERY_SPILL_DIR))"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["7", "7", "True"]
+
+
+def test_manifest_column_sizes_skip_footer_reads(monkeypatch):
+    manifest = {
+        "parts": [{"key": f"d.parquet.parts/run/part-{i:04d}.parquet", "rows": 10} for i in range(50)],
+        "columns": ["a", "b"],
+        "column_bytes": {"a": 1000, "b": 24},
+    }
+    monkeypatch.setattr(dataset_service, "get_manifest", lambda filename: manifest)
+
+    def no_footers(keys):
+        raise AssertionError("footers read on the query path")
+
+    monkeypatch.setattr(dataset_service, "read_column_bytes", no_footers)
+    assert dataset_service.scan_dataset("d.parquet")[1] == 1024
+    assert dataset_service.scan_dataset("d.parquet", columns=["b"])[1] == 24
+
+
+def test_column_bytes_from_a_footer(tmp_path):
+    import pyarrow.parquet as pq
+
+    path = tmp_path / "p.parquet"
+    pl.DataFrame({"a": ["x" * 100] * 1000, "b": list(range(1000))}).write_parquet(path, row_group_size=100)
+    sizes = dataset_service.parquet_column_bytes(pq.ParquetFile(path).metadata)
+    assert set(sizes) == {"a", "b"}
+    assert dataset_service.merge_column_bytes([sizes, sizes]) == {col: 2 * size for col, size in sizes.items()}
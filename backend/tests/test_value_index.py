@@ -0,0 +1,123 @@
+import io
+import time
+from types import SimpleNamespace
+
+import polars as pl
+
+from app.services import value_index_service, coalescing_service
+from app.services.dataset_service import parts_prefix
+from test_coalescing import FakeRedis, run_concurrently
+
+
+class FakeObject:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    def __init__(self, objects: dict):
+        self.objects = objects
+        self.gets = 0
+
+    def get_object(self, bucket, key):
+        self.gets += 1
+        return FakeObject(self.objects[key])
+
+    def stat_object(self, bucket, key):
+        return SimpleNamespace(etag=str(hash(self.objects[key])))
+
+
+def _dictionary(values: list) -> bytes:
+    counts = pl.DataFrame({"column": "c", "value": values, "count": 1})
+    dictionary = (
+        counts.select("value", "count")
+        .with_columns(pl.col("value").str.to_lowercase().alias("value_lower"))
+        .sort("value_lower", "value")
+    )
+    buffer = io.BytesIO()
+    dictionary.write_parquet(buffer)
+    return buffer.getvalue()
+
+
+def test_index_keys_never_nest_under_dataset_keys():
+    # MinIO rejects "<name>.parquet/..." while "<name>.parquet" is an object
+    name = "sales_Sheet1.parquet"
+    key = value_index_service.value_index_key(name, "Region")
+    assert key.startswith(value_index_service.value_index_prefix(name))
+    assert not key.startswith(name + "/")
+    assert not key.startswith(parts_prefix(name))
+    assert not value_index_service.partial_value_counts_key("job1", 0).startswith(name)
+    # One dataset's prefix never contains another dataset's dictionaries
+    assert not value_index_service.value_index_key("a.parquet.x", "c").startswith(
+        value_index_service.value_index_prefix("a.parquet")
+    )
+
+
+def test_cache_is_bounded_by_bytes(monkeypatch):
+    client = FakeMinio({f"k{i}": _dictionary([f"value-{i}-{j:05d}" for j in range(10_000)]) for i in range(4)})
+    monkeypatch.setattr(value_index_service, "minio_client", client)
+    monkeypatch.setattr(value_index_service.settings, "VALUE_INDEX_CACHE_MB", 1)
+    monkeypatch.setattr(value_index_service, "_cache", value_index_service.OrderedDict())
+    monkeypatch.setattr(value_index_service, "_cache_bytes", 0)
+
+    size = value_index_service._load_value_index("k0", "e1").estimated_size()
+    assert 256 * 1024 < size < 512 * 1024  # 3 fit in 1MB
+
+    for i in range(4):
+        value_index_service._load_value_index(f"k{i}", "e1")
+    assert value_index_service._cache_bytes <= 1024 * 1024
+    assert list(value_index_service._cache) == [("k1", "e1"), ("k2", "e1"), ("k3", "e1")]
+
+    gets = client.gets
+    value_index_service._load_value_index("k3", "e1")
+    assert client.gets == gets
+
+    # A new etag replaces the previous version of the same dictionary
+    value_index_service._load_value_index("k3", "e2")
+    assert [k for k in value_index_service._cache if k[0] == "k3"] == [("k3", "e2")]
+
+
+def test_dictionaries_bigger_than_the_cache_are_not_kept(monkeypatch):
+    client = FakeMinio({"big": _dictionary([f"value-{j:06d}" for j in range(100_000)])})
+    monkeypatch.setattr(value_index_service, "minio_client", client)
+    monkeypatch.setattr(value_index_service.settings, "VALUE_INDEX_CACHE_MB", 1)
+    monkeypatch.setattr(value_index_service, "_cache", value_index_service.OrderedDict())
+    monkeypatch.setattr(value_index_service, "_cache_bytes", 0)
+
+    assert value_index_service._load_value_index("big", "e1").height == 100_000
+    assert len(value_index_service._cache) == 0
+
+
+def test_missing_index_is_built_once_for_concurrent_lookups(monkeypatch):
+    name = "sales_Sheet1.parquet"
+    client = FakeMinio({})
+    monkeypatch.setattr(value_index_service, "minio_client", client)
+    monkeypatch.setattr(value_index_service, "_cache", value_index_service.OrderedDict())
+    monkeypatch.setattr(value_index_service, "_cache_bytes", 0)
+    redis_client = FakeRedis()
+    monkeypatch.setattr(coalescing_service, "get_redis_client", lambda: redis_client)
+    monkeypatch.setattr(coalescing_service.settings, "COALESCE_ENABLED", True)
+    monkeypatch.setattr(coalescing_service.settings, "COALESCE_POLL_INTERVAL_SECONDS", 0.01)
+
+    builds = []
+
+    def build(filename, column):
+        builds.append(column)
+        time.sleep(0.3)
+        client.objects[value_index_service.value_index_key(filename, column)] = _dictionary(["East", "West"])
+
+    monkeypatch.setattr(value_index_service, "build_column_value_index", build)
+
+    results, errors = run_concurrently(8, lambda: value_index_service.load_value_index(name, "Region"))
+    assert errors == [None] * 8
+    assert builds == ["Region"]
+    assert all(result["value"].to_list() == ["East", "West"] for result in results)
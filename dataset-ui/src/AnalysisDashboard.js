@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import { 
   ArrowLeft, ChevronLeft, ChevronRight, Search, BarChart3, 
   Table, Layers, MoreVertical, ArrowUpAZ, ArrowDownZA, 
@@ -13,6 +13,7 @@ import { motion, AnimatePresence } from "framer-motion";
 
 const BACKEND_URL = "http://localhost:8100";
 const COLORS = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6', '#ec4899'];
+const CATEGORY_PAGE_SIZE = 50;
 
 export default function AnalysisDashboard({ filename, onBack }) {
   // --- STATE ---
@@ -24,15 +25,19 @@ export default function AnalysisDashboard({ filename, onBack }) {
   const [page, setPage] = useState(1);
   const [totalPages, setTotalPages] = useState(1);
   const [loading, setLoading] = useState(false);
-  const [filters, setFilters] = useState({});
+  const [filters, setFilters] = useState({}); // Typed text: substring search
+  const [equals, setEquals] = useState({}); // Dropdown picks: exact values (prunable)
   const [sortBy, setSortBy] = useState(null);
   const [sortDesc, setSortDesc] = useState(false);
   
   // UI State
   const [activeDropdown, setActiveDropdown] = useState(null);
   const [jumpPage, setJumpPage] = useState("");
-  const [categoryOptions, setCategoryOptions] = useState([]); // Store fetched categories
+  const [categoryOptions, setCategoryOptions] = useState([]); // Fetched { value, count } pages
+  const [catQuery, setCatQuery] = useState(""); // Prefix typed in the dropdown
+  const [catTotal, setCatTotal] = useState(0); // Matches for the current prefix
   const [catLoading, setCatLoading] = useState(false);
+  const catRequest = useRef(0); // Drops responses of superseded searches
 
   // Visualization State
   const [vizX, setVizX] = useState(""); 
@@ -55,7 +60,7 @@ export default function AnalysisDashboard({ filename, onBack }) {
       const res = await fetch(`${BACKEND_URL}/api/analysis/view`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ filename, page, page_size: 20, sort_by: sortBy, sort_desc: sortDesc, filters })
+        body: JSON.stringify({ filename, page, page_size: 20, sort_by: sortBy, sort_desc: sortDesc, filters, equals })
       });
       const result = await res.json();
       if (result.status === "success") {
@@ -73,33 +78,41 @@ export default function AnalysisDashboard({ filename, onBack }) {
       }
     } catch (err) { console.error(err); }
     setLoading(false);
-  }, [filename, page, sortBy, sortDesc, filters, vizX]);
+  }, [filename, page, sortBy, sortDesc, filters, equals, vizX]);
 
-  // Fetch Categories for Dropdown
-  const fetchCategories = async (col) => {
+  // Fetch Categories for Dropdown (value index: prefix search, paged, with counts)
+  const fetchCategories = useCallback(async (col, query, offset = 0) => {
+      const request = ++catRequest.current;
       setCatLoading(true);
-      setCategoryOptions([]);
+      if (offset === 0) setCategoryOptions([]);
       try {
-          const res = await fetch(`${BACKEND_URL}/api/analysis/unique-values?filename=${filename}&column=${col}`);
+          const params = new URLSearchParams({
+              filename, column: col, q: query, mode: "prefix", offset, limit: CATEGORY_PAGE_SIZE
+          });
+          const res = await fetch(`${BACKEND_URL}/api/analysis/values/search?${params}`);
           const result = await res.json();
+          if (request !== catRequest.current) return;
           if (result.status === "success") {
-              setCategoryOptions(result.values);
+              setCategoryOptions(prev => offset === 0 ? result.values : [...prev, ...result.values]);
+              setCatTotal(result.total_matches);
           }
       } catch(err) { console.error(err); }
-      setCatLoading(false);
-  };
+      if (request === catRequest.current) setCatLoading(false);
+  }, [filename]);
 
   const handleDropdownClick = (col) => {
       if (activeDropdown === col) {
           setActiveDropdown(null); // Close
       } else {
-          setActiveDropdown(col); // Open
-          fetchCategories(col); // Load data
+          setCatQuery("");
+          setCategoryOptions([]);
+          setCatTotal(0);
+          setActiveDropdown(col); // Open (the effect below loads the first page)
       }
   };
 
   const applyCategoryFilter = (col, val) => {
-      setFilters(prev => ({...prev, [col]: val}));
+      setEquals(prev => ({...prev, [col]: val ? [val] : []}));
       setPage(1);
       setActiveDropdown(null);
   };
@@ -144,6 +157,12 @@ export default function AnalysisDashboard({ filename, onBack }) {
     return () => clearTimeout(delayDebounce);
   }, [fetchGridData]);
 
+  useEffect(() => {
+    if (!activeDropdown) return;
+    const delayDebounce = setTimeout(() => { fetchCategories(activeDropdown, catQuery); }, 250);
+    return () => clearTimeout(delayDebounce);
+  }, [activeDropdown, catQuery, fetchCategories]);
+
   // --- RENDERERS ---
 
   const renderGrid = () => (
@@ -224,29 +243,54 @@ export default function AnalysisDashboard({ filename, onBack }) {
                                             <div className="my-1 border-t border-zinc-800"></div>
                                             
                                             <div className="text-[10px] font-bold text-zinc-500 px-2 py-1 uppercase tracking-wider">Quick Filters</div>
+
+                                            {/* Value Search */}
+                                            <div className="relative px-1 pb-1">
+                                                <Search className="absolute left-3 top-1.5 text-zinc-600 w-3 h-3" />
+                                                <input 
+                                                    type="text" 
+                                                    autoFocus
+                                                    placeholder="Starts with..."
+                                                    value={catQuery}
+                                                    onChange={(e) => setCatQuery(e.target.value)}
+                                                    className="w-full bg-zinc-950 border border-zinc-800 rounded px-2 pl-7 py-1 text-xs text-zinc-200 focus:border-blue-500/50 outline-none"
+                                                />
+                                            </div>
                                             
                                             {/* Categories List */}
                                             <div className="max-h-40 overflow-y-auto custom-scrollbar">
-                                                {catLoading ? (
+                                                {catLoading && categoryOptions.length === 0 ? (
                                                     <div className="px-2 py-2 text-xs text-zinc-500 text-center">Loading...</div>
                                                 ) : categoryOptions.length > 0 ? (
-                                                    categoryOptions.map((val) => (
+                                                    categoryOptions.map(({ value, count }) => (
                                                         <button 
-                                                            key={val} 
-                                                            onClick={() => applyCategoryFilter(col, val)}
-                                                            className="flex items-center gap-2 w-full px-2 py-1.5 hover:bg-zinc-800 rounded text-xs text-zinc-300 text-left truncate"
+                                                            key={value} 
+                                                            onClick={() => applyCategoryFilter(col, value)}
+                                                            className="flex items-center gap-2 w-full px-2 py-1.5 hover:bg-zinc-800 rounded text-xs text-zinc-300 text-left"
                                                         >
-                                                            <CheckSquare size={12} className={filters[col] === val ? "text-blue-500" : "text-zinc-600"} />
-                                                            {val}
+                                                            <CheckSquare size={12} className={`shrink-0 ${(equals[col] || []).includes(value) ? "text-blue-500" : "text-zinc-600"}`} />
+                                                            <span className="truncate flex-1">{value}</span>
+                                                            <span className="text-[10px] text-zinc-500 font-mono">{count.toLocaleString()}</span>
                                                         </button>
                                                     ))
                                                 ) : (
                                                     <div className="px-2 py-2 text-xs text-zinc-500">No categories found</div>
                                                 )}
+
+                                                {/* Next Page */}
+                                                {categoryOptions.length > 0 && categoryOptions.length < catTotal && (
+                                                    <button 
+                                                        disabled={catLoading}
+                                                        onClick={() => fetchCategories(col, catQuery, categoryOptions.length)}
+                                                        className="w-full px-2 py-1.5 hover:bg-zinc-800 rounded text-[10px] text-blue-400 text-center disabled:text-zinc-600"
+                                                    >
+                                                        {catLoading ? "Loading..." : `Show more (${(catTotal - categoryOptions.length).toLocaleString()} left)`}
+                                                    </button>
+                                                )}
                                             </div>
 
                                             {/* Clear Filter */}
-                                            {filters[col] && (
+                                            {(equals[col] || []).length > 0 && (
                                                 <button 
                                                     onClick={() => applyCategoryFilter(col, "")}
                                                     className="mt-1 px-2 py-1.5 bg-red-900/20 text-red-400 hover:bg-red-900/30 rounded text-xs text-center"
@@ -1,11 +1,19 @@
 import os
 import json
 import tempfile
+import uuid
+from celery import chord
 from minio import Minio
 
 from shared.celery_app import celery_app
 from shared.state import DATASETS
 from app.config import settings
+from app.worker_utils.chunked_conversion import (
+    MultilineFieldError, plan_chunks, convert_chunk, write_manifest, remove_failed_job,
+)
+from app.services.dataset_service import STAGING_PREFIX, remove_objects
+from app.services.processing_service import convert_sheet_to_parquet
+from app.services.layout_service import relayout_dataset as run_relayout
 
 # ============================
 # MinIO client
@@ -64,3 +72,80 @@ def process_dataset(self, dataset_id: str, object_key: str, sheet_name=None):
         DATASETS[dataset_id]["status"] = "failed"
         DATASETS[dataset_id]["error"] = str(e)
         raise self.retry(exc=e, countdown=5)
+
+
+# ============================
+# Fan-out conversion
+# ============================
+# plan (1 task) -> convert chunks (N tasks, any worker) -> finalize (chord callback)
+
+@celery_app.task(name="worker.plan_chunked_conversion")
+def plan_chunked_conversion(object_key: str, sheet_name: str):
+    job_id = uuid.uuid4().hex
+    try:
+        dataset_name, chunks = plan_chunks(
+            object_key,
+            sheet_name,
+            job_id,
+            chunk_bytes=settings.CONVERT_FANOUT_CHUNK_MB * 1024 * 1024,
+            chunk_rows=settings.CONVERT_FANOUT_CHUNK_ROWS,
+        )
+    except MultilineFieldError as e:
+        print(f"⚠️ {e}: converting in a single process instead")
+        return convert_sheet_to_parquet(object_key, sheet_name)
+    except Exception:
+        remove_objects(f"{STAGING_PREFIX}/{job_id}/")
+        raise
+    source = {"object_key": object_key, "sheet_name": sheet_name, "job_id": job_id}
+
+    # A chunk out of retries skips the callback: the errback cleans up instead
+    callback = finalize_chunked_conversion.s(dataset_name, source).on_error(
+        cleanup_chunked_conversion.s(dataset_name, job_id)
+    )
+    result = chord([convert_chunk_to_parquet.s(chunk) for chunk in chunks])(callback)
+
+    return {
+        "status": "queued",
+        "processed_file": dataset_name,
+        "chunks": len(chunks),
+        "finalize_task_id": result.id,
+    }
+
+
+@celery_app.task(bind=True, max_retries=3, name="worker.convert_chunk_to_parquet")
+def convert_chunk_to_parquet(self, chunk: dict):
+    try:
+        return convert_chunk(chunk)
+    except MultilineFieldError:
+        # Same bytes on every retry
+        raise
+    except Exception as e:
+        raise self.retry(exc=e, countdown=5)
+
+
+@celery_app.task(name="worker.finalize_chunked_conversion")
+def finalize_chunked_conversion(parts: list, dataset_name: str, source: dict):
+    manifest = write_manifest(dataset_name, source, parts)
+    return {
+        "status": "success",
+        "original_sheet": source["sheet_name"],
+        "processed_file": dataset_name,
+        "rows": manifest["rows"],
+        "columns": manifest["columns"],
+        "parts": len(manifest["parts"]),
+    }
+
+
+@celery_app.task(name="worker.cleanup_chunked_conversion")
+def cleanup_chunked_conversion(request, exc, traceback, dataset_name: str, job_id: str):
+    print(f"❌ Chunked conversion {job_id} failed: {exc}")
+    remove_failed_job(dataset_name, job_id)
+
+
+# ============================
+# Parquet re-layout
+# ============================
+
+@celery_app.task(name="worker.relayout_dataset")
+def relayout_dataset(filename: str, sort_columns=None):
+    return run_relayout(filename, sort_columns)